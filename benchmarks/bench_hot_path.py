@@ -0,0 +1,216 @@
+# benchmarks/bench_hot_path.py
+"""
+Benchmarks the parsing and rendering hot path of a club report.
+
+Driven by the recorded `clubs/matches` and `clubs/overallStats` payloads in
+benchmarks/fixtures. Each stage is measured for payloads of 1 to 1000 matches
+and reported as one JSON object per line (ops/sec, mean time, traced memory).
+
+Usage:
+    python benchmarks/bench_hot_path.py
+    python benchmarks/bench_hot_path.py --sizes 1,100 --output results.jsonl
+    python benchmarks/bench_hot_path.py --baseline results.jsonl --max-regression 0.15
+"""
+
+import argparse
+import copy
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from fc_clubs_api.api import list_adapter  # noqa: E402
+from fc_clubs_api.match_registry import MatchRegistry  # noqa: E402
+from fc_clubs_api.models import OverallStats  # noqa: E402
+from main import extract_match_info, format_matches, get_relative_time  # noqa: E402
+
+FIXTURES = Path(__file__).resolve().parent / "fixtures"
+CLUB_ID = "2938194"
+CLUB_NAME = "Metallist"
+DEFAULT_SIZES = [1, 10, 100, 1000]
+
+
+def load_fixture(name: str) -> Any:
+    with open(FIXTURES / name, encoding="utf-8") as file:
+        return json.load(file)
+
+
+def build_payload(recorded: List[Dict[str, Any]], size: int) -> List[Dict[str, Any]]:
+    """
+    Builds a `clubs/matches` payload of `size` matches by cycling through the
+    recorded ones, giving each copy its own matchId and an older timestamp.
+    """
+    payload = []
+    oldest = min(match["timestamp"] for match in recorded)
+    for i in range(size):
+        match = copy.deepcopy(recorded[i % len(recorded)])
+        generation = i // len(recorded)
+        if generation:
+            match["matchId"] = f"{match['matchId']}{generation:04d}"
+            match["timestamp"] = oldest - generation * 3600
+        payload.append(match)
+    return payload
+
+
+def measure(func: Callable[[], Any], min_time: float) -> Dict[str, float]:
+    """
+    Runs `func` repeatedly for at least `min_time` seconds, then once more
+    under tracemalloc to record its memory behaviour.
+    """
+    func()  # Warm up
+
+    iterations = 0
+    start = time.perf_counter()
+    elapsed = 0.0
+    while elapsed < min_time:
+        func()
+        iterations += 1
+        elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        tracemalloc.reset_peak()
+        base_current, _ = tracemalloc.get_traced_memory()
+        result = func()
+        current, peak = tracemalloc.get_traced_memory()
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    del result
+
+    retained_blocks = sum(
+        stat.count_diff for stat in after.compare_to(before, "filename") if stat.count_diff > 0
+    )
+    return {
+        "iterations": iterations,
+        "ops_per_sec": iterations / elapsed,
+        "mean_us": elapsed / iterations * 1e6,
+        "alloc_peak_bytes": peak - base_current,
+        "alloc_retained_bytes": current - base_current,
+        "alloc_retained_blocks": retained_blocks,
+    }
+
+
+def run(sizes: List[int], min_time: float) -> List[Dict[str, Any]]:
+    recorded_matches = load_fixture("matches.json")
+    overall_raw = load_fixture("overall_stats.json")
+    overall_stats = list_adapter(OverallStats).validate_python(overall_raw)[0]
+
+    results = []
+
+    def record(stage: str, size: int, func: Callable[[], Any]):
+        result = {"stage": stage, "size": size}
+        result.update(measure(func, min_time))
+        result["matches_per_sec"] = result["ops_per_sec"] * size
+        results.append(result)
+        print(
+            f"{stage:<24} size={size:<5} {result['ops_per_sec']:>12.1f} ops/s "
+            f"peak={result['alloc_peak_bytes']:>10} B",
+            file=sys.stderr,
+        )
+
+    # Responses are parsed the way EAFCApiService parses them
+    record("validate_overall_stats", 1, lambda: list_adapter(OverallStats).validate_python(overall_raw))
+
+    for size in sizes:
+        payload = build_payload(recorded_matches, size)
+        registry = MatchRegistry()
+        parsed = registry.resolve_all(payload)
+        infos = [extract_match_info(match, CLUB_ID) for match in parsed]
+        datetimes = [datetime.fromtimestamp(match.timestamp) for match in parsed]
+        opposing_skill_ratings = {
+            team["club_id"]: 1500 for info in infos for team in info["teams"]
+            if team["club_id"] != CLUB_ID
+        }
+
+        def full_report():
+            # A fresh registry, as for matches the bot has not seen yet
+            matches = MatchRegistry().resolve_all(payload)
+            matches_info = [extract_match_info(match, CLUB_ID) for match in matches]
+            return format_matches(matches_info, CLUB_NAME, overall_stats, opposing_skill_ratings)
+
+        # New matches are validated and interned, known ones come from the registry
+        record("resolve_matches_new", size, lambda: MatchRegistry().resolve_all(payload))
+        record("resolve_matches_known", size, lambda: registry.resolve_all(payload))
+        record("extract_match_info", size, lambda: [extract_match_info(match, CLUB_ID) for match in parsed])
+        record("get_relative_time", size, lambda: [get_relative_time(dt) for dt in datetimes])
+        record(
+            "format_matches", size,
+            lambda: format_matches(infos, CLUB_NAME, overall_stats, opposing_skill_ratings)
+        )
+        record("report_total", size, full_report)
+
+    return results
+
+
+def compare(results: List[Dict[str, Any]], baseline_path: str, max_regression: float) -> bool:
+    """
+    Compares ops/sec against a previous run. Returns False if any stage got
+    slower than the allowed regression.
+    """
+    baseline = {}
+    with open(baseline_path, encoding="utf-8") as file:
+        for line in file:
+            if line.strip():
+                entry = json.loads(line)
+                if "stage" in entry:
+                    baseline[(entry["stage"], entry["size"])] = entry
+
+    ok = True
+    for result in results:
+        previous = baseline.get((result["stage"], result["size"]))
+        if not previous:
+            continue
+        change = result["ops_per_sec"] / previous["ops_per_sec"] - 1
+        if change < -max_regression:
+            ok = False
+            print(
+                f"REGRESSION {result['stage']} size={result['size']}: "
+                f"{previous['ops_per_sec']:.1f} -> {result['ops_per_sec']:.1f} ops/s ({change:+.1%})",
+                file=sys.stderr,
+            )
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                        help="Comma-separated payload sizes (matches per payload)")
+    parser.add_argument("--min-time", type=float, default=0.5,
+                        help="Minimum seconds to run each stage")
+    parser.add_argument("--output", help="Write JSONL results to this file instead of stdout")
+    parser.add_argument("--baseline", help="JSONL results of a previous run to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.15,
+                        help="Allowed ops/sec drop versus the baseline (0.15 = 15%%)")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(",") if size]
+    results = run(sizes, args.min_time)
+
+    meta = {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "machine": platform.machine(),
+        "recorded_at": datetime.now().isoformat(timespec="seconds"),
+    }
+    lines = [json.dumps({**result, **meta}) for result in results]
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write("\n".join(lines) + "\n")
+    else:
+        print("\n".join(lines))
+
+    if args.baseline and not compare(results, args.baseline, args.max_regression):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
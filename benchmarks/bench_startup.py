@@ -0,0 +1,105 @@
+# benchmarks/bench_startup.py
+"""
+Measures cold-start import cost of the bot, the notify server and the report
+pipeline with `python -X importtime`.
+
+Each module is imported in a fresh interpreter several times. The median
+wall time and the heaviest imports are reported as one JSON object per line,
+and --budget-ms fails the run when a module goes over its import budget.
+
+Usage:
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --modules bot,server --budget-ms 400
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_MODULES = ["bot", "server", "main", "fc_clubs_api.api"]
+
+
+def parse_importtime(stderr: str) -> List[Tuple[str, int, int]]:
+    """
+    Parses `-X importtime` output into (module, self_us, cumulative_us).
+    """
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+            entries.append((name.strip(), int(self_us), int(cumulative_us)))
+        except ValueError:
+            continue  # Header line
+    return entries
+
+
+def measure(module: str, repeat: int) -> Dict[str, Any]:
+    env = {
+        **os.environ,
+        "PYTHONPATH": str(ROOT),
+        # bot.py and server.py exit without a token
+        "TELEGRAM_BOT_TOKEN": os.getenv("TELEGRAM_BOT_TOKEN", "0:startup-benchmark"),
+    }
+    wall_times = []
+    top_level_us = []
+    heaviest: Dict[str, int] = {}
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            cwd=ROOT, env=env, capture_output=True, text=True,
+        )
+        wall_times.append(time.perf_counter() - start)
+        if result.returncode != 0:
+            raise RuntimeError(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+
+        entries = parse_importtime(result.stderr)
+        top_level_us.append(next(
+            (cumulative for name, _, cumulative in entries if name == module), 0
+        ))
+        for name, self_us, _ in entries:
+            heaviest[name] = max(heaviest.get(name, 0), self_us)
+
+    top = sorted(heaviest.items(), key=lambda item: item[1], reverse=True)[:15]
+    return {
+        "module": module,
+        "repeat": repeat,
+        "wall_ms_median": statistics.median(wall_times) * 1000,
+        "import_ms_median": statistics.median(top_level_us) / 1000,
+        "heaviest_self_ms": {name: us / 1000 for name, us in top},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--modules", default=",".join(DEFAULT_MODULES))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float,
+                        help="Fail if any module's median import time exceeds this")
+    args = parser.parse_args()
+
+    over_budget = False
+    for module in [m for m in args.modules.split(",") if m]:
+        result = measure(module, args.repeat)
+        print(json.dumps(result))
+        if args.budget_ms is not None and result["import_ms_median"] > args.budget_ms:
+            over_budget = True
+            print(
+                f"OVER BUDGET {module}: {result['import_ms_median']:.1f} ms > {args.budget_ms} ms",
+                file=sys.stderr,
+            )
+    if over_budget:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
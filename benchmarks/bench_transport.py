@@ -0,0 +1,143 @@
+# benchmarks/bench_transport.py
+"""
+Compares the EA transports on full club reports against the local EA stand-in.
+
+Each transport fetches `--reports` reports (club search, matches and the
+opponents' overall stats), `--concurrency` at a time, from a stand-in with
+`--latency` seconds per request. The stand-in speaks HTTP/1.1, or cleartext
+HTTP/2 for the h2c transport. Report latency and the number of connections
+the stand-in accepted are reported as one JSON object per line.
+
+Transports:
+    per_call: a new requests.get per call (the API layer before transports)
+    http1: shared requests.Session, HTTP/1.1 keep-alive
+    h2c: shared httpx client, HTTP/2 multiplexed (needs httpx[http2])
+
+Usage:
+    python benchmarks/bench_transport.py
+    python benchmarks/bench_transport.py --transports http1,h2c --reports 100 --concurrency 16
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+# Measure the transports, not the rate limit
+os.environ["EA_RATE_LIMIT"] = "0"
+
+import requests  # noqa: E402
+
+import database  # noqa: E402
+from fc_clubs_api import transport  # noqa: E402
+from fc_clubs_api.platform import Platform  # noqa: E402
+from loadtest.fake_ea import FakeEAServer, Latency  # noqa: E402
+
+DEFAULT_TRANSPORTS = ["per_call", "http1", "h2c"]
+CLUB_NAME = "Metallist"
+
+
+class PerCallTransport:
+    name = "per_call"
+
+    def get(self, url, headers, params, timeout):
+        return requests.get(url, headers=headers, params=params, timeout=timeout)
+
+    def close(self):
+        pass
+
+
+def create(kind: str):
+    if kind == "per_call":
+        return PerCallTransport()
+    return transport.create_transport(kind)
+
+
+def run_transport(kind: str, reports: int, concurrency: int, latency: float) -> Dict[str, Any]:
+    from main import fetch_club_report
+
+    ea = FakeEAServer(latency=Latency(latency), http2=kind == "h2c").start()
+    os.environ["EA_API_BASE_URL"] = ea.base_url
+    transport._transport = create(kind)
+
+    def one_report(_: int) -> float:
+        start = time.perf_counter()
+        record = fetch_club_report(CLUB_NAME, Platform.COMMON_GEN5)
+        if record.get("error"):
+            raise RuntimeError(record["error"])
+        return time.perf_counter() - start
+
+    try:
+        fetch_club_report(CLUB_NAME, Platform.COMMON_GEN5)  # Warm-up: schemas, first connection
+        ea.calls.clear()
+        ea.not_modified = 0
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            latencies = sorted(executor.map(one_report, range(reports)))
+        elapsed = time.perf_counter() - start
+        connections = ea.connections
+        requests_sent = sum(ea.calls.values())
+        not_modified = ea.not_modified
+    finally:
+        transport._transport.close()
+        transport._transport = None
+        ea.stop()
+
+    return {
+        "transport": kind,
+        "reports": reports,
+        "concurrency": concurrency,
+        "ea_latency_ms": latency * 1000,
+        "ea_requests": requests_sent,
+        "not_modified": not_modified,
+        "connections": connections,
+        "reports_per_sec": round(reports / elapsed, 2),
+        "p50_ms": round(statistics.median(latencies) * 1000, 1),
+        "p95_ms": round(latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))] * 1000, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--transports", default=",".join(DEFAULT_TRANSPORTS),
+                        help="Comma-separated transports to compare")
+    parser.add_argument("--reports", type=int, default=40, help="Reports per transport")
+    parser.add_argument("--concurrency", type=int, default=8, help="Reports fetched at a time")
+    parser.add_argument("--latency", type=float, default=0.02,
+                        help="Stand-in latency per request, in seconds")
+    parser.add_argument("--output", help="Write JSONL results to this file instead of stdout")
+    args = parser.parse_args()
+
+    # Reports store their matches; keep them out of the real database
+    database.DATABASE = str(Path(tempfile.mkdtemp(prefix="fcbot-bench-")) / "users.db")
+    database.initialize_db()
+
+    meta = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "recorded_at": datetime.now().isoformat(timespec="seconds"),
+    }
+    lines: List[str] = []
+    for kind in [kind for kind in args.transports.split(",") if kind]:
+        result = run_transport(kind, args.reports, args.concurrency, args.latency)
+        lines.append(json.dumps({**result, **meta}))
+        if not args.output:
+            print(lines[-1], flush=True)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write("\n".join(lines) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,11 @@
+import asyncio
+import io
 import os
 import logging
 import html
+import functools
+import threading
+import time
 from telegram import Update
 from telegram.ext import (
     ApplicationBuilder,
@@ -10,20 +15,19 @@ from telegram.ext import (
     filters,
 )
 from dotenv import load_dotenv
-from main import get_matches_info, get_overall_stats, format_matches
-from fc_clubs_api.schemas import Platform, ClubSearchInput  # Added ClubSearchInput
-from fc_clubs_api.api import EAFCApiService  # Added EAFCApiService
+from fc_clubs_api.platform import Platform
 from telegram.error import TelegramError
-from database import add_user, remove_user, get_all_users
-from fc_clubs_api.models import OverallStats  # Import the OverallStats model
+from database import count_users, queue_add_user, queue_remove_user, is_subscribed, record_club_lookup
+from fc_clubs_api.metrics import Gauge, Histogram, start_http_server
+from fc_clubs_api import tracing
+from fc_clubs_api.scheduler import Priority, priority
+from profiling import ProfileCapture
+from logging_config import configure_logging
 # Load environment variables from .env file
 load_dotenv()
 
-# Configure logging
-logging.basicConfig(
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    level=logging.DEBUG,
-)
+# Configure logging (LOG_LEVEL, LOG_FORMAT)
+configure_logging()
 logger = logging.getLogger(__name__)
 
 # Retrieve the bot token from environment variables
@@ -35,12 +39,61 @@ if not TELEGRAM_BOT_TOKEN:
     )
     exit(1)
 
+# Comma-separated Telegram user IDs allowed to use admin commands
+ADMIN_USER_IDS = {
+    int(user_id) for user_id in os.getenv("ADMIN_USER_IDS", "").split(",") if user_id.strip()
+}
+
+PROFILER = ProfileCapture("bot")
+
+# Seconds a user waits for EA before getting a cached report or an error
+REPORT_DEADLINE = float(os.getenv("REPORT_DEADLINE", "8"))
+
+HANDLER_SECONDS = Histogram(
+    "bot_handler_duration_seconds",
+    "Time spent handling a Telegram update, by handler.",
+    ["handler"],
+)
+
+# Read from the in-memory subscriber set, kept current by /start and /stop
+SUBSCRIBERS = Gauge("bot_subscribers", "Users subscribed to notifications.")
+
+def timed_handler(func):
+    """
+    Records the handler's latency in HANDLER_SECONDS, traces the update and
+    profiles it when PROFILER is armed. EA requests made by the handler are
+    interactive, so they are sent ahead of background work.
+    """
+    latency = HANDLER_SECONDS.labels(func.__name__)
+
+    @functools.wraps(func)
+    async def wrapper(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        start = time.perf_counter()
+        try:
+            # Each update gets its own trace
+            with tracing.span(f"bot.{func.__name__}"), PROFILER.capture(func.__name__), \
+                    priority(Priority.INTERACTIVE):
+                return await func(update, context)
+        finally:
+            latency.observe(time.perf_counter() - start)
+
+    return wrapper
+
+async def run_in_worker(func, *args):
+    """
+    Runs blocking work in a worker thread, like asyncio.to_thread, and adds
+    it to the handler's profile when PROFILER is capturing it.
+    """
+    return await asyncio.to_thread(PROFILER.run, func, *args)
+
 def escape_text_html(text: str) -> str:
     return html.escape(text)
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     user_id = update.effective_user.id
-    add_user(user_id)  # Save the user ID
+    if not is_subscribed(user_id):
+        queue_add_user(user_id)  # Save the user ID (written in the next batch)
+        SUBSCRIBERS.set(count_users())
     welcome_message = (
         "👋 Hello! I'm the FC Clubs Bot.\n\n"
         "Send me the name of a club (e.g., <b>Metallist</b>) and I'll provide you with the latest match information."
@@ -52,16 +105,175 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
         "📖 <b>Help</b>\n\n"
         "To get match information for a club, simply send the club's name. For example:\n"
         "<code>Metallist</code>\n\n"
-        "Ensure that the club name is spelled correctly."
+        "Ensure that the club name is spelled correctly.\n\n"
+        "<code>/form Metallist</code> shows the players' recent form.\n"
+        "<code>/h2h Metallist vs Frytomania</code> shows the head-to-head record.\n"
+        "<code>/player Name</code> shows which club a player plays for."
     )
     await update.message.reply_text(help_message, parse_mode="HTML")
 
 async def stop(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     user_id = update.effective_user.id
-    remove_user(user_id)  # Remove the user ID
+    if is_subscribed(user_id):
+        queue_remove_user(user_id)  # Remove the user ID (written in the next batch)
+        SUBSCRIBERS.set(count_users())
     farewell_message = "👋 You've been unsubscribed from FC Clubs Bot notifications."
     await update.message.reply_text(farewell_message)
 
+async def profile_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    if update.effective_user.id not in ADMIN_USER_IDS:
+        return
+    try:
+        count = int(context.args[0]) if context.args else 10
+    except ValueError:
+        await update.message.reply_text("Usage: /profile <number of updates>")
+        return
+    PROFILER.arm(count)
+    await update.message.reply_text(
+        f"Profiling the next {count} updates into {PROFILER.directory}."
+    )
+
+async def player_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    query = " ".join(context.args).strip() if context.args else ""
+    if not query:
+        await update.message.reply_text("Usage: /player <player name>")
+        return
+
+    from player_index import INDEX, format_players
+
+    # Answered from the local index only; the first lookup may have to build it
+    with tracing.span("player_lookup"):
+        players = await run_in_worker(INDEX.lookup, query)
+    await update.message.reply_text(format_players(query, players), parse_mode="HTML")
+
+async def caches_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    if update.effective_user.id not in ADMIN_USER_IDS:
+        return
+    from fc_clubs_api.memory import cache_usage, format_cache_usage
+    await update.message.reply_text(format_cache_usage(cache_usage()))
+
+async def form_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    club_name = " ".join(context.args).strip() if context.args else ""
+    if not club_name:
+        await update.message.reply_text("Usage: /form <club name>")
+        return
+
+    import requests
+    from fc_clubs_api.deadline import deadline
+    from main import get_club_matches_info
+    from fc_clubs_api.api import EAFCApiService
+    from fc_clubs_api.schemas import ClubSearchInput
+    from player_form import form_summary, format_form
+
+    platform = Platform.COMMON_GEN5
+
+    def fetch_club():
+        with deadline(REPORT_DEADLINE):
+            with tracing.span("club_search"):
+                search_response = EAFCApiService().search_club(
+                    ClubSearchInput(clubName=club_name, platform=platform)
+                )
+            if not search_response:
+                return None
+            selected_club = search_response[0]
+
+            # Stores the latest matches, which updates the form arrays
+            try:
+                with tracing.span("matches", club_id=selected_club.clubId):
+                    get_club_matches_info(selected_club)
+            except requests.RequestException as e:
+                logger.warning("Showing stored form for %s, fetching matches failed: %s", club_name, e)
+            # Building the arrays of a club not in the cache reads its whole match history
+            with tracing.span("form"):
+                return selected_club, form_summary(selected_club.clubId)
+
+    try:
+        found = await run_in_worker(fetch_club)
+    except Exception as e:
+        logger.error("Error fetching matches for form: %s", e)
+        await update.message.reply_text(
+            "❌ An error occurred while fetching match information. Please try again later."
+        )
+        return
+    if found is None:
+        await update.message.reply_text("⚠️ No clubs found matching the search criteria.")
+        return
+
+    selected_club, players = found
+    text = format_form(selected_club.clubName, players)
+    if len(text) > 4000:
+        # Long player names can still push the reply over Telegram's limit
+        await update.message.reply_document(
+            io.BytesIO(text.encode("utf-8")),
+            filename="form_output.txt",
+            caption="📄 Here is the player form:",
+        )
+    else:
+        await update.message.reply_text(text, parse_mode="HTML")
+
+async def h2h_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    from head_to_head import INDEX, format_head_to_head, parse_club_pair
+
+    pair = parse_club_pair(" ".join(context.args)) if context.args else None
+    if not pair:
+        await update.message.reply_text(
+            "Usage: /h2h <club> vs <club> (or two quoted club names)"
+        )
+        return
+
+    import requests
+    from fc_clubs_api.deadline import deadline
+    from main import get_club_matches_info
+    from fc_clubs_api.api import EAFCApiService
+    from fc_clubs_api.schemas import ClubSearchInput
+
+    platform = Platform.COMMON_GEN5
+
+    def fetch_clubs():
+        """
+        Returns the two clubs, or the name that was not found.
+        """
+        with deadline(REPORT_DEADLINE):
+            api_service = EAFCApiService()
+            clubs = []
+            with tracing.span("club_search"):
+                for club_name in pair:
+                    search_response = api_service.search_club(
+                        ClubSearchInput(clubName=club_name, platform=platform)
+                    )
+                    if not search_response:
+                        return club_name
+                    clubs.append(search_response[0])
+
+            # Recent meetings are among the first club's matches; storing them updates the index
+            try:
+                with tracing.span("matches", club_id=clubs[0].clubId):
+                    get_club_matches_info(clubs[0])
+            except requests.RequestException as e:
+                logger.warning("Showing stored head-to-head, fetching matches failed: %s", e)
+            # A pair that is not cached is read from the match history
+            with tracing.span("h2h"):
+                return clubs, INDEX.record(clubs[0].clubId, clubs[1].clubId)
+
+    try:
+        found = await run_in_worker(fetch_clubs)
+    except Exception as e:
+        logger.error("Error fetching matches for head-to-head: %s", e)
+        await update.message.reply_text(
+            "❌ An error occurred while fetching match information. Please try again later."
+        )
+        return
+    if isinstance(found, str):
+        await update.message.reply_text(
+            f"⚠️ No clubs found matching <b>{escape_text_html(found)}</b>.",
+            parse_mode="HTML",
+        )
+        return
+
+    clubs, record = found
+    text = format_head_to_head(clubs[0].clubName, clubs[1].clubName, record)
+    await update.message.reply_text(text, parse_mode="HTML")
+
 async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     club_name = update.message.text.strip()
     if not club_name:
@@ -73,91 +285,65 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         parse_mode="HTML",
     )
 
+    # The report pipeline is imported on first use, see preload_report_modules
+    from main import render_club_report
+    from report_cache import get_report
+
     platform = Platform.COMMON_GEN5  # Adjust based on your platform enums
 
-    try:
-        # Fetch matches information
-        matches_info = get_matches_info(club_name, platform)
-
-        if not matches_info:
-            await update.message.reply_text("⚠️ No matches found for the specified club.")
-            return
-
-        # Search for the club to get its ID
-        api_service = EAFCApiService()
-        input_data = ClubSearchInput(clubName=club_name, platform=platform)
-        search_response = api_service.search_club(input_data)
-
-        if not search_response:
-            await update.message.reply_text("⚠️ No clubs found matching the search criteria.")
-            return
-
-        selected_club = search_response[0]
-        selected_club_id = selected_club.clubId
-
-        # Fetch overall stats using the club's ID
-        overall_stats = get_overall_stats(selected_club_id, platform)
-
-        if not overall_stats:
-            await update.message.reply_text("⚠️ No overall stats found for the specified club.")
-            return
-
-        # Collect all unique opposing club IDs
-        opposing_club_ids = set()
-        for match in matches_info:
-            for team in match['teams']:
-                if team['club_id'] != selected_club_id:
-                    opposing_club_ids.add(team['club_id'])
-
-        # Fetch skill ratings for opposing clubs
-        opposing_skill_ratings = {}
-        for club_id in opposing_club_ids:
-            club_stats = get_overall_stats(club_id, platform)
-            if club_stats:
-                try:
-                    skill_rating = int(club_stats.skillRating)
-                except ValueError:
-                    skill_rating = "N/A"
-                opposing_skill_ratings[club_id] = skill_rating
-            else:
-                opposing_skill_ratings[club_id] = "N/A"
+    def fetch_report():
+        record = get_report(club_name, platform)
+        if not record.get("error"):
+            record_club_lookup(club_name, platform.value)  # Ranks the clubs warmed at startup
+        return record
 
+    try:
+        # Fetched in a worker thread within REPORT_DEADLINE; a cached report is served if EA fails
+        record = await run_in_worker(fetch_report)
     except Exception as e:
-        logger.error(f"Error fetching matches or stats: {e}")
+        logger.error("Error fetching matches or stats: %s", e)
         await update.message.reply_text(
             "❌ An error occurred while fetching match information. Please try again later."
         )
         return
 
+    if record.get("error") == "club not found":
+        await update.message.reply_text("⚠️ No clubs found matching the search criteria.")
+        return
+    if record.get("error"):
+        await update.message.reply_text("⚠️ No matches found for the specified club.")
+        return
+    if not record.get("overall_stats"):
+        await update.message.reply_text("⚠️ No overall stats found for the specified club.")
+        return
+
     # Format the matches with indicators and separators, including overall stats and opposing skill ratings
-    formatted_text = format_matches(matches_info, club_name, overall_stats, opposing_skill_ratings)
+    with tracing.span("render", matches=len(record["matches"])):
+        formatted_text = render_club_report(record)
 
     # Escape the text for HTML
     escaped_text = formatted_text  # Assuming format_matches returns HTML-formatted text
 
-    logger.debug(f"Escaped Text (HTML): {escaped_text}")
+    logger.debug("Report for %s: %d characters", club_name, len(escaped_text))
 
-    if len(escaped_text) > 4000:
-        # Send as a document if text is too long
-        with open("matches_output.txt", "w", encoding="utf-8") as file:
-            file.write(formatted_text)
-        with open("matches_output.txt", "rb") as file:
+    with tracing.span("telegram_send", length=len(escaped_text)):
+        if len(escaped_text) > 4000:
+            # Send as a document if text is too long
             await update.message.reply_document(
-                file,
+                io.BytesIO(formatted_text.encode("utf-8")),
                 filename="matches_output.txt",
                 caption="📄 Here is the match information:",
             )
-        os.remove("matches_output.txt")
-    else:
-        try:
-            await update.message.reply_text(
-                escaped_text, parse_mode="HTML", disable_web_page_preview=True
-            )
-        except TelegramError as e:
-            logger.error(f"Failed to send message: {e}")
-            await update.message.reply_text(
-                "❌ An error occurred while sending the message. Please try again later."
-            )
+        else:
+            try:
+                await update.message.reply_text(
+                    escaped_text, parse_mode="HTML", disable_web_page_preview=True
+                )
+            except TelegramError as e:
+                logger.error("Failed to send message: %s", e)
+                await update.message.reply_text(
+                    "❌ An error occurred while sending the message. Please try again later."
+                )
 
 async def error_handler(update: object, context: ContextTypes.DEFAULT_TYPE) -> None:
     logger.error(msg="Exception while handling an update:", exc_info=context.error)
@@ -167,30 +353,74 @@ async def error_handler(update: object, context: ContextTypes.DEFAULT_TYPE) -> N
                 "❌ An unexpected error occurred. Please try again later."
             )
         except TelegramError as e:
-            logger.error(f"Failed to send error message: {e}")
+            logger.error("Failed to send error message: %s", e)
+
+def preload_report_modules():
+    """
+    Imports the report pipeline and builds its pydantic schemas and the
+    player index, then fetches the reports of subscribed and popular clubs
+    and keeps them warm.
+    Run in the background at startup so polling starts before the heavy
+    imports finish.
+    """
+    from main import warm_up
+    warm_up()
+
+    from player_index import INDEX
+    INDEX.ensure_loaded()
+
+    from cache_warming import keep_warm
+    keep_warm()
 
 def main():
-    from database import initialize_db
-    from fc_clubs_api.api import EAFCApiService  # Ensure EAFCApiService is accessible
+    from database import initialize_db, flush_user_writes, enable_subscriber_cache
 
     initialize_db()  # Initialize the database
-
-    application = ApplicationBuilder().token(TELEGRAM_BOT_TOKEN).build()
+    enable_subscriber_cache()  # Keep subscriber lookups out of SQLite
+    SUBSCRIBERS.set(count_users())
+
+    # EA requests run in worker threads, so updates from different users are handled concurrently
+    builder = (
+        ApplicationBuilder()
+        .token(TELEGRAM_BOT_TOKEN)
+        .concurrent_updates(int(os.getenv("BOT_CONCURRENT_UPDATES", "32")))
+    )
+    telegram_api_base_url = os.getenv("TELEGRAM_API_BASE_URL")
+    if telegram_api_base_url:
+        builder = builder.base_url(telegram_api_base_url)
+    application = builder.build()
 
     # Register handlers
-    application.add_handler(CommandHandler("start", start))
-    application.add_handler(CommandHandler("help", help_command))
-    application.add_handler(CommandHandler("stop", stop))
+    application.add_handler(CommandHandler("start", timed_handler(start)))
+    application.add_handler(CommandHandler("help", timed_handler(help_command)))
+    application.add_handler(CommandHandler("stop", timed_handler(stop)))
+    application.add_handler(CommandHandler("form", timed_handler(form_command)))
+    application.add_handler(CommandHandler("h2h", timed_handler(h2h_command)))
+    application.add_handler(CommandHandler("player", timed_handler(player_command)))
+    application.add_handler(CommandHandler("profile", profile_command))
+    application.add_handler(CommandHandler("caches", caches_command))
     application.add_handler(
-        MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message)
+        MessageHandler(filters.TEXT & ~filters.COMMAND, timed_handler(handle_message))
     )
 
     # Register the error handler
     application.add_error_handler(error_handler)
 
+    PROFILER.arm_from_env()  # PROFILE_NEXT_N profiles the first updates after start
+
+    # Expose /metrics for the bot process if a port is configured
+    metrics_port = os.getenv("BOT_METRICS_PORT")
+    if metrics_port:
+        start_http_server(int(metrics_port))
+
+    threading.Thread(target=preload_report_modules, name="preload", daemon=True).start()
+
     # Start the bot
     logger.info("Bot is starting...")
-    application.run_polling()
+    try:
+        application.run_polling()
+    finally:
+        flush_user_writes()  # Write pending subscribe/unsubscribe events
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,123 @@
+# cache_warming.py
+
+import contextvars
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple
+
+import requests
+
+from database import get_popular_clubs, get_subscribed_clubs
+from fc_clubs_api.platform import Platform
+from fc_clubs_api.scheduler import Priority, priority
+
+logger = logging.getLogger(__name__)
+
+
+def warm_targets(limit: int, lookup_days: float = 14) -> List[Tuple[str, Platform]]:
+    """
+    Clubs worth fetching at startup: those recently broadcast to subscribers,
+    then the most requested ones of the last `lookup_days` days.
+    """
+    targets = [(name, Platform.COMMON_GEN5) for name in get_subscribed_clubs(limit)]
+    since = int(time.time() - lookup_days * 86400)
+    for name, platform in get_popular_clubs(limit, since):
+        try:
+            targets.append((name, Platform(platform)))
+        except ValueError:
+            continue
+
+    seen = set()
+    unique = []
+    for name, platform in targets:
+        key = (name.strip().lower(), platform)
+        if key not in seen:
+            seen.add(key)
+            unique.append((name, platform))
+    return unique[:limit]
+
+
+def _warm_members(club_id: str, club_name: str, platform: Platform):
+    # The roster adds players without stored matches to the /player index
+    from fc_clubs_api.api import EAFCApiService
+    from fc_clubs_api.schemas import MemberStatsInput
+    from player_index import INDEX
+
+    try:
+        member_stats = EAFCApiService().member_stats(MemberStatsInput(clubId=club_id, platform=platform))
+    except (requests.RequestException, ValueError) as e:
+        logger.debug("No member stats for %s: %s", club_name, e)
+        return
+    INDEX.add_members(club_id, club_name, member_stats.members)
+
+
+def _warm_one(name: str, platform: Platform, members: bool) -> bool:
+    from report_cache import get_report_cache
+
+    try:
+        record = get_report_cache().warm(name, platform)
+        if record is None:
+            return False
+        if members:
+            _warm_members(record["club_id"], record.get("matched_name") or name, platform)
+        return True
+    except (requests.RequestException, ValueError) as e:
+        logger.debug("Could not warm %s: %s", name, e)
+        return False
+
+
+def warm_caches(members: bool = True) -> int:
+    """
+    Caches the reports of the clubs of warm_targets and, with `members`, adds
+    their members to the player index (the bot; the notify server only reads
+    the reports). Clubs are fetched concurrently at BACKGROUND priority, so
+    the shared rate budget serves user requests first. Warmed reports are
+    served for REPORT_WARM_TTL, see ReportCache.
+
+    Configured from the environment:
+        WARM_CACHE_CLUBS: clubs to prefetch (default 20, 0 disables warming).
+        WARM_CACHE_CONCURRENCY: clubs fetched at a time (default 4).
+        WARM_LOOKUP_DAYS: how far back requests count as popular (default 14).
+
+    Returns:
+        int: The number of clubs warmed.
+    """
+    limit = int(os.getenv("WARM_CACHE_CLUBS", "20"))
+    if limit <= 0:
+        return 0
+    targets = warm_targets(limit, float(os.getenv("WARM_LOOKUP_DAYS", "14")))
+    if not targets:
+        return 0
+
+    start = time.perf_counter()
+    concurrency = max(1, int(os.getenv("WARM_CACHE_CONCURRENCY", "4")))
+    with priority(Priority.BACKGROUND):
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="warm") as executor:
+            futures = [
+                executor.submit(contextvars.copy_context().run, _warm_one, name, platform, members)
+                for name, platform in targets
+            ]
+            warmed = sum(future.result() for future in futures)
+    logger.info(
+        "Warmed %d of %d clubs in %.1fs", warmed, len(targets), time.perf_counter() - start
+    )
+    return warmed
+
+
+def keep_warm(members: bool = True):
+    """
+    Runs warm_caches now and then every WARM_CACHE_INTERVAL seconds (default
+    300, 0 warms once), so warmed reports are replaced before REPORT_WARM_TTL
+    runs out. Meant for a daemon thread.
+    """
+    interval = float(os.getenv("WARM_CACHE_INTERVAL", "300"))
+    while True:
+        try:
+            warm_caches(members)
+        except Exception as e:
+            logger.error("Cache warming failed: %s", e)
+        if interval <= 0:
+            return
+        time.sleep(interval)
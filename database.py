@@ -1,37 +1,461 @@
+import atexit
+import logging
+import os
 import sqlite3
-from typing import List
+import threading
+import time
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from migrations import migrate
 
 DATABASE = 'users.db'
 
+logger = logging.getLogger(__name__)
+
+# Write-behind operations for the users table
+OP_ADD = "add"
+OP_REMOVE = "remove"
+
 def initialize_db():
     conn = sqlite3.connect(DATABASE)
-    cursor = conn.cursor()
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS users (
-            user_id INTEGER PRIMARY KEY
-        )
-    ''')
-    conn.commit()
-    conn.close()
+    try:
+        migrate(conn, batch_size=int(os.getenv("MIGRATION_BATCH_SIZE", "1000")))
+    finally:
+        conn.close()
+
+def iter_user_id_chunks(chunk_size: int = 500) -> Iterator[List[int]]:
+    """
+    Yields subscriber IDs in ascending chunks of at most `chunk_size`.
 
-def add_user(user_id: int):
+    Each chunk is a separate keyset query, so no read transaction is held
+    open while the caller works through a chunk.
+    """
+    last_user_id = None
+    while True:
+        conn = sqlite3.connect(DATABASE)
+        try:
+            if last_user_id is None:
+                cursor = conn.execute(
+                    'SELECT user_id FROM users ORDER BY user_id LIMIT ?', (chunk_size,)
+                )
+            else:
+                cursor = conn.execute(
+                    'SELECT user_id FROM users WHERE user_id > ? ORDER BY user_id LIMIT ?',
+                    (last_user_id, chunk_size),
+                )
+            chunk = [row[0] for row in cursor]
+        finally:
+            conn.close()
+        if not chunk:
+            return
+        yield chunk
+        if len(chunk) < chunk_size:
+            return
+        last_user_id = chunk[-1]
+
+def iter_user_ids(chunk_size: int = 500) -> Iterator[int]:
+    """
+    Yields subscriber IDs one by one, fetching them from SQLite in chunks.
+    """
+    for chunk in iter_user_id_chunks(chunk_size):
+        yield from chunk
+
+def get_delivery_floor(club_id: str) -> Optional[int]:
+    """
+    Returns the oldest last-delivered match timestamp of the club over all
+    subscribers: -1 if some subscriber never got the club, None if there are
+    no subscribers. Matches up to this timestamp are known to everyone.
+    """
     conn = sqlite3.connect(DATABASE)
-    cursor = conn.cursor()
-    cursor.execute('INSERT OR IGNORE INTO users (user_id) VALUES (?)', (user_id,))
-    conn.commit()
-    conn.close()
+    try:
+        row = conn.execute(
+            '''
+            SELECT COUNT(*), MIN(COALESCE(d.last_timestamp, -1))
+            FROM users u LEFT JOIN user_club_deliveries d
+                ON d.user_id = u.user_id AND d.club_id = ?
+            ''',
+            (club_id,),
+        ).fetchone()
+    finally:
+        conn.close()
+    return row[1] if row[0] else None
 
-def remove_user(user_id: int):
+def get_last_deliveries(club_id: str, user_ids: List[int]) -> Dict[int, int]:
+    """
+    Maps the given users to the timestamp of the newest match of the club
+    delivered to them. Users that never got the club are left out.
+    """
+    if not user_ids:
+        return {}
     conn = sqlite3.connect(DATABASE)
-    cursor = conn.cursor()
-    cursor.execute('DELETE FROM users WHERE user_id = ?', (user_id,))
-    conn.commit()
-    conn.close()
+    try:
+        placeholders = ",".join("?" * len(user_ids))
+        rows = conn.execute(
+            f'''
+            SELECT user_id, last_timestamp FROM user_club_deliveries
+            WHERE club_id = ? AND user_id IN ({placeholders})
+            ''',
+            [club_id, *user_ids],
+        ).fetchall()
+    finally:
+        conn.close()
+    return dict(rows)
 
-def get_all_users() -> List[int]:
+def record_deliveries(club_id: str, user_ids: Iterable[int], last_timestamp: int, last_match_id: str):
+    """
+    Stores the newest match of the club delivered to each of the users, in one transaction.
+    """
+    now = int(time.time())
+    rows = [(user_id, club_id, last_timestamp, last_match_id, now) for user_id in user_ids]
+    if not rows:
+        return
     conn = sqlite3.connect(DATABASE)
-    cursor = conn.cursor()
-    cursor.execute('SELECT user_id FROM users')
-    rows = cursor.fetchall()
-    conn.close()
+    try:
+        with conn:
+            conn.executemany(
+                '''
+                INSERT OR REPLACE INTO user_club_deliveries
+                    (user_id, club_id, last_timestamp, last_match_id, delivered_at)
+                VALUES (?, ?, ?, ?, ?)
+                ''',
+                rows,
+            )
+    finally:
+        conn.close()
+
+
+def get_subscribed_clubs(limit: int) -> List[str]:
+    """
+    Names of the clubs most recently broadcast to subscribers, newest first.
+    """
+    conn = sqlite3.connect(DATABASE)
+    try:
+        rows = conn.execute(
+            '''
+            SELECT s.club_name FROM (
+                SELECT club_id, MAX(delivered_at) AS delivered_at
+                FROM user_club_deliveries GROUP BY club_id
+            ) d JOIN club_rolling_stats s ON s.club_id = d.club_id
+            WHERE s.club_name != ''
+            ORDER BY d.delivered_at DESC LIMIT ?
+            ''',
+            (limit,),
+        ).fetchall()
+    finally:
+        conn.close()
     return [row[0] for row in rows]
+
+def get_popular_clubs(limit: int, since: int = 0) -> List[Tuple[str, str]]:
+    """
+    (club name, platform) of the most requested club reports that were
+    requested at or after `since`, most requested first.
+    """
+    conn = sqlite3.connect(DATABASE)
+    try:
+        rows = conn.execute(
+            '''
+            SELECT club_name, platform FROM club_lookups WHERE last_requested >= ?
+            ORDER BY lookups DESC, last_requested DESC LIMIT ?
+            ''',
+            (since, limit),
+        ).fetchall()
+    finally:
+        conn.close()
+    return [(row[0], row[1]) for row in rows]
+
+
+class ClubLookupCounter:
+    """
+    Counts report requests per club in memory and adds them to club_lookups
+    at most every `flush_interval` seconds (on the next request) and at exit.
+    """
+
+    def __init__(self, flush_interval: float = 60):
+        self.flush_interval = flush_interval
+        # (club key, platform) -> [club name, lookups, last requested]
+        self._pending: Dict[Tuple[str, str], list] = {}
+        self._lock = threading.Lock()
+        self._flushed_at = time.monotonic()
+
+    def record(self, club_name: str, platform: str):
+        club_name = club_name.strip()
+        now = int(time.time())
+        with self._lock:
+            entry = self._pending.setdefault((club_name.lower(), platform), [club_name, 0, now])
+            entry[0], entry[2] = club_name, now
+            entry[1] += 1
+            due = time.monotonic() - self._flushed_at >= self.flush_interval
+            if due:
+                self._flushed_at = time.monotonic()
+        if due:
+            self.flush()
+
+    def flush(self) -> int:
+        """
+        Writes the pending counts in one transaction.
+
+        Returns:
+            int: The number of clubs written.
+        """
+        with self._lock:
+            batch = self._pending
+            self._pending = {}
+        if not batch:
+            return 0
+        try:
+            conn = sqlite3.connect(DATABASE)
+            try:
+                with conn:
+                    conn.executemany(
+                        '''
+                        INSERT INTO club_lookups (club_key, platform, club_name, lookups, last_requested)
+                        VALUES (?, ?, ?, ?, ?)
+                        ON CONFLICT (club_key, platform) DO UPDATE SET
+                            club_name = excluded.club_name,
+                            lookups = lookups + excluded.lookups,
+                            last_requested = MAX(last_requested, excluded.last_requested)
+                        ''',
+                        [(key, platform, *entry) for (key, platform), entry in batch.items()],
+                    )
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            logger.error("Failed to write %d club lookup counts: %s", len(batch), e)
+            return 0
+        return len(batch)
+
+
+_club_lookups: Optional[ClubLookupCounter] = None
+_club_lookups_lock = threading.Lock()
+
+def record_club_lookup(club_name: str, platform: str):
+    """
+    Counts one report request for the club; the counts rank the clubs warmed
+    at startup. Configured with CLUB_LOOKUP_FLUSH_S (default 60).
+    """
+    global _club_lookups
+    if _club_lookups is None:
+        with _club_lookups_lock:
+            if _club_lookups is None:
+                _club_lookups = ClubLookupCounter(float(os.getenv("CLUB_LOOKUP_FLUSH_S", "60")))
+                atexit.register(_club_lookups.flush)
+    _club_lookups.record(club_name, platform)
+
+
+class SubscriberSet:
+    """
+    In-memory copy of the subscribed user IDs.
+
+    Loaded once from SQLite and then kept in sync by the write-behind queue.
+    """
+
+    def __init__(self):
+        self._ids = set()
+        self._lock = threading.Lock()
+
+    def load(self):
+        ids = set(iter_user_ids())
+        with self._lock:
+            self._ids = ids
+
+    def add(self, user_id: int):
+        with self._lock:
+            self._ids.add(user_id)
+
+    def discard(self, user_id: int):
+        with self._lock:
+            self._ids.discard(user_id)
+
+    def __contains__(self, user_id: int) -> bool:
+        return user_id in self._ids
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+
+_subscribers: Optional[SubscriberSet] = None
+
+def enable_subscriber_cache() -> SubscriberSet:
+    """
+    Loads the subscriber set into memory. Only use it in the process that owns
+    the write path, other processes would see a stale copy.
+    """
+    global _subscribers
+    if _subscribers is None:
+        subscribers = SubscriberSet()
+        subscribers.load()
+        _subscribers = subscribers
+    return _subscribers
+
+def is_subscribed(user_id: int) -> bool:
+    if _subscribers is not None:
+        return user_id in _subscribers
+    conn = sqlite3.connect(DATABASE)
+    try:
+        row = conn.execute('SELECT 1 FROM users WHERE user_id = ?', (user_id,)).fetchone()
+    finally:
+        conn.close()
+    return row is not None
+
+def count_users() -> int:
+    if _subscribers is not None:
+        return len(_subscribers)
+    conn = sqlite3.connect(DATABASE)
+    try:
+        return conn.execute('SELECT COUNT(*) FROM users').fetchone()[0]
+    finally:
+        conn.close()
+
+
+class UserWriteQueue:
+    """
+    Write-behind queue for subscribe/unsubscribe events.
+
+    Events are collected in memory and written to the users table in a single
+    transaction every `flush_interval_ms` milliseconds, or as soon as
+    `max_batch` users are pending. Only the latest operation per user is kept.
+    """
+
+    def __init__(self, flush_interval_ms: int = 500, max_batch: int = 100):
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_batch = max_batch
+        self._pending: Dict[int, str] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def add(self, user_id: int):
+        self._put(user_id, OP_ADD)
+
+    def remove(self, user_id: int):
+        self._put(user_id, OP_REMOVE)
+
+    def _put(self, user_id: int, op: str):
+        if _subscribers is not None:
+            if op == OP_ADD:
+                _subscribers.add(user_id)
+            else:
+                _subscribers.discard(user_id)
+        with self._lock:
+            self._pending[user_id] = op
+            full = len(self._pending) >= self.max_batch
+        self.start()
+        if full:
+            self._wakeup.set()
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def start(self):
+        """
+        Starts the background flusher thread if it is not running yet.
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopped.clear()
+            self._thread = threading.Thread(
+                target=self._run, name="user-write-behind", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self):
+        """
+        Stops the flusher thread and writes everything that is still pending.
+        """
+        self._stopped.set()
+        self._wakeup.set()
+        thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+        self.flush()
+
+    def flush(self) -> int:
+        """
+        Writes all pending operations in one transaction.
+
+        Returns:
+            int: The number of users written.
+        """
+        with self._flush_lock:
+            with self._lock:
+                batch = self._pending
+                self._pending = {}
+            if not batch:
+                return 0
+
+            now = int(time.time())
+            to_add = [(user_id, now) for user_id, op in batch.items() if op == OP_ADD]
+            to_remove = [(user_id,) for user_id, op in batch.items() if op == OP_REMOVE]
+            try:
+                conn = sqlite3.connect(DATABASE)
+                try:
+                    with conn:
+                        if to_add:
+                            conn.executemany(
+                                'INSERT OR IGNORE INTO users (user_id, subscribed_at) VALUES (?, ?)',
+                                to_add,
+                            )
+                        if to_remove:
+                            conn.executemany(
+                                'DELETE FROM users WHERE user_id = ?', to_remove
+                            )
+                            conn.executemany(
+                                'DELETE FROM user_club_deliveries WHERE user_id = ?', to_remove
+                            )
+                finally:
+                    conn.close()
+            except sqlite3.Error as e:
+                logger.error("Failed to flush %d user writes: %s", len(batch), e)
+                # Put the batch back without overwriting newer operations
+                with self._lock:
+                    for user_id, op in batch.items():
+                        self._pending.setdefault(user_id, op)
+                return 0
+
+            logger.debug("Flushed %d user writes", len(batch))
+            return len(batch)
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+
+_user_writes: Optional[UserWriteQueue] = None
+_user_writes_lock = threading.Lock()
+
+def get_user_write_queue() -> UserWriteQueue:
+    """
+    Returns the process-wide write-behind queue, creating it on first use.
+    Configured with USER_WRITE_FLUSH_MS and USER_WRITE_BATCH_SIZE.
+    """
+    global _user_writes
+    if _user_writes is None:
+        with _user_writes_lock:
+            if _user_writes is None:
+                _user_writes = UserWriteQueue(
+                    flush_interval_ms=int(os.getenv("USER_WRITE_FLUSH_MS", "500")),
+                    max_batch=int(os.getenv("USER_WRITE_BATCH_SIZE", "100")),
+                )
+                atexit.register(_user_writes.stop)
+    return _user_writes
+
+def queue_add_user(user_id: int):
+    get_user_write_queue().add(user_id)
+
+def queue_remove_user(user_id: int):
+    get_user_write_queue().remove(user_id)
+
+def flush_user_writes():
+    """
+    Stops the write-behind queue and flushes pending writes. Call on shutdown.
+    """
+    if _user_writes is not None:
+        _user_writes.stop()
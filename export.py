@@ -0,0 +1,285 @@
+# export.py
+"""
+Exports match history into columnar files for analytics.
+
+Three tables are written, each partitioned by club and season:
+
+    <out>/matches/club_id=<id>/season_id=<season>/part-00000.<ext>
+    <out>/players/...
+    <out>/aggregates/...
+
+Rows are read from the match history (or fetched raw from EA with --fetch) and
+flushed every --rows-per-file rows, so memory stays flat for long histories.
+No pydantic models are built along the way. A partition that is exported again
+is replaced: its old part files are removed before the first new one is written.
+
+Usage:
+    python export.py --out exports/                      # every stored club, Parquet
+    python export.py --out exports/ --format npz 2938194  # one club, NumPy .npz
+    python export.py --out exports/ --fetch Metallist     # fetch from EA, no storage
+"""
+
+import argparse
+import glob
+import os
+import sys
+from collections import defaultdict
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+
+import match_store
+from database import initialize_db
+
+MATCH_COLUMNS = [
+    ("club_id", str), ("match_id", str), ("timestamp", int), ("season_id", str),
+    ("club_name", str), ("opponent_id", str), ("opponent_name", str),
+    ("goals_for", int), ("goals_against", int), ("result", str), ("winner_by_dnf", int),
+]
+PLAYER_COLUMNS = [
+    ("club_id", str), ("match_id", str), ("timestamp", int), ("season_id", str),
+    ("player_id", str), ("player_name", str), ("pos", str), ("rating", float),
+    ("goals", int), ("assists", int), ("shots", int), ("passes_made", int),
+    ("pass_attempts", int), ("tackles_made", int), ("tackle_attempts", int),
+    ("saves", int), ("red_cards", int), ("mom", int), ("clean_sheet", int),
+]
+AGGREGATE_FIELDS = [
+    "assists", "cleansheetsany", "cleansheetsdef", "cleansheetsgk", "goals",
+    "goalsconceded", "losses", "mom", "passattempts", "passesmade", "rating",
+    "redcards", "saves", "SCORE", "shots", "tackleattempts", "tacklesmade", "wins",
+]
+AGGREGATE_COLUMNS = [
+    ("club_id", str), ("match_id", str), ("timestamp", int), ("season_id", str),
+] + [(field, float if field == "rating" else int) for field in AGGREGATE_FIELDS]
+
+TABLES = {
+    "matches": MATCH_COLUMNS,
+    "players": PLAYER_COLUMNS,
+    "aggregates": AGGREGATE_COLUMNS,
+}
+
+
+def _int(value: Any) -> int:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
+
+
+def _float(value: Any) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def match_rows(match: Dict[str, Any], club_id: str) -> Iterator[Tuple[str, Tuple]]:
+    """
+    Yields (table, row) pairs for one raw match seen from `club_id`'s side.
+    """
+    club = match["clubs"].get(club_id)
+    if club is None:
+        return
+    match_id = str(match["matchId"])
+    timestamp = int(match["timestamp"])
+    season_id = club.get("season_id") or "unknown"
+    opponent_id = next((cid for cid in match["clubs"] if cid != club_id), "")
+    opponent = match["clubs"].get(opponent_id, {})
+    goals_for = _int(club.get("goals"))
+    goals_against = _int(opponent.get("goals")) if opponent else _int(club.get("goalsAgainst"))
+    if goals_for > goals_against:
+        result = "win"
+    elif goals_for < goals_against:
+        result = "loss"
+    else:
+        result = "draw"
+
+    yield "matches", (
+        club_id, match_id, timestamp, season_id,
+        (club.get("details") or {}).get("name", ""), opponent_id,
+        (opponent.get("details") or {}).get("name", ""),
+        goals_for, goals_against, result, 1 if club.get("winnerByDnf") == "1" else 0,
+    )
+
+    for player_id, player in match.get("players", {}).get(club_id, {}).items():
+        yield "players", (
+            club_id, match_id, timestamp, season_id,
+            player_id, player.get("playername", ""), player.get("pos", ""),
+            _float(player.get("rating")),
+            _int(player.get("goals")), _int(player.get("assists")), _int(player.get("shots")),
+            _int(player.get("passesmade")), _int(player.get("passattempts")),
+            _int(player.get("tacklesmade")), _int(player.get("tackleattempts")),
+            _int(player.get("saves")), _int(player.get("redcards")),
+            _int(player.get("mom")), _int(player.get("cleansheetsany")),
+        )
+
+    aggregate = match.get("aggregate", {}).get(club_id)
+    if aggregate:
+        yield "aggregates", (club_id, match_id, timestamp, season_id) + tuple(
+            _float(aggregate.get(field)) if field == "rating" else _int(aggregate.get(field))
+            for field in AGGREGATE_FIELDS
+        )
+
+
+class _ParquetWriter:
+    extension = "parquet"
+
+    def __init__(self):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            sys.exit("Parquet export needs pyarrow (pip install pyarrow), or use --format npz.")
+        self.pa = pyarrow
+        self.pq = pyarrow.parquet
+        self.types = {int: pyarrow.int64(), float: pyarrow.float64(), str: pyarrow.string()}
+
+    def write(self, path: str, columns: List[Tuple[str, type]], rows: List[Tuple]):
+        arrays = [
+            self.pa.array([row[i] for row in rows], type=self.types[kind])
+            for i, (_, kind) in enumerate(columns)
+        ]
+        table = self.pa.Table.from_arrays(arrays, names=[name for name, _ in columns])
+        self.pq.write_table(table, path)
+
+
+class _NpzWriter:
+    extension = "npz"
+
+    def __init__(self):
+        try:
+            import numpy
+        except ImportError:
+            sys.exit("NumPy export needs numpy (pip install numpy).")
+        self.np = numpy
+        self.types = {int: numpy.int64, float: numpy.float64, str: numpy.str_}
+
+    def write(self, path: str, columns: List[Tuple[str, type]], rows: List[Tuple]):
+        arrays = {
+            name: self.np.array([row[i] for row in rows], dtype=self.types[kind])
+            for i, (name, kind) in enumerate(columns)
+        }
+        self.np.savez_compressed(path, **arrays)
+
+
+class PartitionedExporter:
+    """
+    Buffers rows per (table, club, season) partition and writes a part file
+    whenever a buffer reaches `rows_per_file`.
+
+    Part files left in a partition by an earlier export are removed before
+    this exporter writes its first part there, so the partition never mixes
+    runs.
+    """
+
+    def __init__(self, out_dir: str, writer, rows_per_file: int = 50_000):
+        self.out_dir = out_dir
+        self.writer = writer
+        self.rows_per_file = rows_per_file
+        self._buffers: Dict[Tuple[str, str, str], List[Tuple]] = defaultdict(list)
+        self._parts: Dict[Tuple[str, str, str], int] = defaultdict(int)
+        self.files_written = 0
+        self.rows_written = 0
+
+    def add(self, table: str, row: Tuple):
+        # club_id and season_id are the first and fourth column of every table
+        key = (table, row[0], row[3])
+        buffer = self._buffers[key]
+        buffer.append(row)
+        if len(buffer) >= self.rows_per_file:
+            self._flush(key)
+
+    def _flush(self, key: Tuple[str, str, str]):
+        rows = self._buffers.pop(key, None)
+        if not rows:
+            return
+        table, club_id, season_id = key
+        directory = os.path.join(self.out_dir, table, f"club_id={club_id}", f"season_id={season_id}")
+        part = self._parts[key]
+        if part == 0:
+            for stale in glob.glob(os.path.join(glob.escape(directory), "part-*")):
+                os.remove(stale)
+        os.makedirs(directory, exist_ok=True)
+        self._parts[key] += 1
+        path = os.path.join(directory, f"part-{part:05d}.{self.writer.extension}")
+        self.writer.write(path, TABLES[table], rows)
+        self.files_written += 1
+        self.rows_written += len(rows)
+
+    def flush_club(self, club_id: str):
+        """
+        Writes the remaining rows of a club, so only one club is buffered at a time.
+        """
+        for key in [key for key in self._buffers if key[1] == club_id]:
+            self._flush(key)
+
+    def close(self):
+        for key in list(self._buffers):
+            self._flush(key)
+
+
+def fetched_matches(club_name: str, platform) -> Tuple[str, List[Dict[str, Any]]]:
+    """
+    Fetches a club's matches from EA as raw dicts (no model validation).
+    """
+    from fc_clubs_api.api import EAFCApiService
+    from fc_clubs_api.schemas import ClubSearchInput, MatchesStatsInput, MatchType
+
+    api_service = EAFCApiService()
+    clubs = api_service._get("CLUB_SEARCH", ClubSearchInput(clubName=club_name, platform=platform))
+    if not clubs:
+        return "", []
+    club_id = str(clubs[0]["clubId"])
+    matches = api_service._get("MATCHES_STATS", MatchesStatsInput(
+        clubIds=club_id, platform=platform, matchType=MatchType.LEAGUE_MATCH
+    ))
+    return club_id, matches
+
+
+def export_club(exporter: PartitionedExporter, club_id: str, matches: Iterable[Dict[str, Any]]) -> int:
+    count = 0
+    for match in matches:
+        for table, row in match_rows(match, club_id):
+            exporter.add(table, row)
+        count += 1
+    exporter.flush_club(club_id)
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("clubs", nargs="*",
+                        help="Club IDs to export from the match history (default: all), "
+                             "or club names with --fetch")
+    parser.add_argument("--out", required=True, help="Output directory")
+    parser.add_argument("--format", choices=["parquet", "npz"], default="parquet")
+    parser.add_argument("--rows-per-file", type=int, default=50_000)
+    parser.add_argument("--fetch", action="store_true",
+                        help="Fetch the named clubs from EA instead of reading the match history")
+    args = parser.parse_args()
+
+    writer = _ParquetWriter() if args.format == "parquet" else _NpzWriter()
+    exporter = PartitionedExporter(args.out, writer, args.rows_per_file)
+
+    if args.fetch:
+        from fc_clubs_api.platform import Platform
+        for club_name in args.clubs:
+            club_id, matches = fetched_matches(club_name, Platform.COMMON_GEN5)
+            if not club_id:
+                print(f"{club_name}: club not found", file=sys.stderr)
+                continue
+            count = export_club(exporter, club_id, matches)
+            print(f"{club_name} ({club_id}): {count} matches", file=sys.stderr)
+    else:
+        initialize_db()
+        for club_id in args.clubs or match_store.stored_club_ids():
+            count = export_club(exporter, club_id, match_store.iter_club_matches(club_id))
+            print(f"{club_id}: {count} matches", file=sys.stderr)
+
+    exporter.close()
+    print(
+        f"Wrote {exporter.rows_written} rows in {exporter.files_written} files to {args.out}",
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,23 @@
 # fc_clubs_api/api.py
 
+import logging
+import os
+import time
 import requests
-from typing import Any, TypeVar, Type, Generic, List
+from typing import Any, Callable, TypeVar, Type, Generic, List
 from urllib.parse import urljoin
 from enum import Enum  # Import Enum
 from .routes import ROUTES, TRouteName
-from pydantic import BaseModel
+from .metrics import EA_REQUEST_SECONDS, EA_RESPONSES, record_cache_lookup
+from . import deadline, tracing
+from .deadline import DeadlineExceeded
+from .hedging import get_hedge_policy
+from .match_registry import get_match_registry
+from .revalidation import Validated, body_hash, get_validator_cache
+from .scheduler import get_scheduler
+from .transport import get_transport
+from functools import lru_cache
+from pydantic import BaseModel, TypeAdapter
 from .models import (
     Club,
     ClubInfo,
@@ -17,14 +29,36 @@ from .models import (
 
 TInput = TypeVar("TInput", bound=BaseModel)
 
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=None)
+def list_adapter(model: Type[BaseModel]) -> TypeAdapter:
+    """
+    Returns a TypeAdapter for List[model], built once and reused, so a list
+    response is validated in a single call.
+    """
+    return TypeAdapter(List[model])
+
 
 class EAFCApiService:
-    def __init__(self, base_url: str = "https://proclubs.ea.com/api/fc/"):
+    def __init__(self, base_url: str = None, timeout: float = None, transport=None):
+        # EA_API_BASE_URL points the service at another host (e.g. the load-test stand-in)
+        if base_url is None:
+            base_url = os.getenv("EA_API_BASE_URL", "https://proclubs.ea.com/api/fc/")
         # Ensure base_url ends with a slash for urljoin
         if not base_url.endswith("/"):
             base_url += "/"
         self.base_url = base_url
 
+        # Seconds per request (EA_REQUEST_TIMEOUT), shortened by the caller's deadline if any
+        if timeout is None:
+            timeout = float(os.getenv("EA_REQUEST_TIMEOUT", "10"))
+        self.timeout = timeout
+
+        # Shared connection(s) to EA, HTTP/1.1 or HTTP/2 (EA_HTTP_TRANSPORT)
+        self.transport = transport or get_transport()
+
         # Define default headers
         self.default_headers = {
             "User-Agent": (
@@ -38,11 +72,13 @@ class EAFCApiService:
         self,
         route_name: TRouteName,
         input_data: BaseModel,
-        response_model: Type[BaseModel] = None
+        response_model: Type[BaseModel] = None,
+        parse: Callable[[Any], Any] = None,
     ) -> Any:
         """
         Internal method to perform GET requests.
         Validates input, constructs the URL, and returns the parsed JSON as a Pydantic model if provided.
+        On routes marked `revalidate`, `parse` is skipped when the response is unchanged.
         """
         # Retrieve route configuration
         route_config = ROUTES[route_name]
@@ -57,25 +93,102 @@ class EAFCApiService:
             if v is not None
         }
 
-        # Debugging: Print the constructed URL and params
-        print(f"Request URL: {full_url}")
-        print(f"Query Parameters: {params}")
-
-        # Send the GET request
-        response = requests.get(full_url, headers=self.default_headers, params=params)
-        response.raise_for_status()  # Raise an error for 4xx/5xx responses
+        logger.debug("GET %s params=%s", full_url, params)
+
+        # Ask only for changes to a response we already parsed
+        validators = get_validator_cache()
+        revalidate = route_config.revalidate and validators.enabled
+        cache_key = (full_url, tuple(sorted(params.items())))
+        cached = validators.get(cache_key) if revalidate else None
+        headers = self.default_headers
+        if cached is not None:
+            headers = {**headers, **validators.conditional_headers(cached)}
+
+        with tracing.span(f"ea.{route_name}", route=route_config.url) as request_span:
+            # Wait for a slot in the shared request budget (interactive requests go first)
+            try:
+                queued = get_scheduler().acquire(timeout=deadline.remaining())
+            except TimeoutError:
+                EA_RESPONSES.labels(route_name, "deadline").inc()
+                raise DeadlineExceeded(f"No request slot for {route_name} within the deadline")
+            request_span.set_attribute("queued_ms", round(queued * 1000, 3))
+
+            def send() -> Any:
+                return self._send(route_name, full_url, params, headers)
+
+            hedging = get_hedge_policy()
+            if hedging.enabled:
+                # GETs are idempotent, a slow one may be sent twice
+                response = hedging.call(route_name, send, self._reserve_hedge_slot)
+            else:
+                response = send()
+
+            if revalidate:
+                etag = response.headers.get("ETag")
+                last_modified = response.headers.get("Last-Modified")
+                unchanged = cached is not None and (
+                    response.status_code == 304 or body_hash(response.content) == cached.body_hash
+                )
+                record_cache_lookup("ea_revalidate", unchanged)
+                request_span.set_attribute("unchanged", unchanged)
+                if unchanged:
+                    refreshed = cached._replace(
+                        etag=etag or cached.etag,
+                        last_modified=last_modified or cached.last_modified,
+                    )
+                    if refreshed != cached:
+                        validators.put(cache_key, refreshed)
+                    return cached.parsed
 
-        # Parse the response JSON
         json_data = response.json()
 
         # If a response model is provided, parse the JSON into the model
-        if response_model:
+        if parse:
+            parsed = parse(json_data)
+        elif response_model:
             if issubclass(response_model, BaseModel):
-                return response_model.parse_obj(json_data)
+                parsed = response_model.parse_obj(json_data)
             else:
-                return response_model(json_data)
+                parsed = response_model(json_data)
         else:
-            return json_data
+            parsed = json_data
+
+        if revalidate:
+            validators.put(cache_key, Validated(etag, last_modified, body_hash(response.content), parsed))
+        return parsed
+
+    def _send(self, route_name: TRouteName, full_url: str, params: dict, headers: dict) -> Any:
+        """
+        Sends one GET request and returns the response (a 304 is not an error).
+        """
+        start = time.perf_counter()
+        try:
+            response = self.transport.get(
+                full_url,
+                headers=headers,
+                params=params,
+                timeout=deadline.request_timeout(self.timeout),
+            )
+        except requests.RequestException:
+            EA_RESPONSES.labels(route_name, "error").inc()
+            raise
+        finally:
+            EA_REQUEST_SECONDS.labels(route_name).observe(time.perf_counter() - start)
+        EA_RESPONSES.labels(route_name, response.status_code).inc()
+        request_span = tracing.current_span()
+        if request_span is not None:
+            request_span.set_attribute("status", response.status_code)
+        response.raise_for_status()  # Raise an error for 4xx/5xx responses
+        return response
+
+    @staticmethod
+    def _reserve_hedge_slot() -> bool:
+        # Hedges only use spare budget, they never queue
+        try:
+            get_scheduler().acquire(timeout=0)
+        except TimeoutError:
+            return False
+        return True
 
     # -- Public methods that mirror the TS code: --
 
@@ -85,15 +198,16 @@ class EAFCApiService:
         Returns a list of Club objects.
         """
         raw_response = self._get("CLUB_SEARCH", input_data)
-        return [Club(**club_dict) for club_dict in raw_response]
+        return list_adapter(Club).validate_python(raw_response)
 
     def overall_stats(self, input_data: BaseModel) -> List[OverallStats]:
         """
         Get overall stats of the club.
         Returns a list of OverallStats objects.
         """
-        raw_response = self._get("OVERALL_STATS", input_data)
-        return [OverallStats(**stat_dict) for stat_dict in raw_response]
+        return self._get(
+            "OVERALL_STATS", input_data, parse=list_adapter(OverallStats).validate_python
+        )
 
     def member_career_stats(self, input_data: BaseModel) -> MemberCareerStats:
         """
@@ -112,14 +226,14 @@ class EAFCApiService:
     def matches_stats(self, input_data: BaseModel) -> List[Match]:
         """
         Get the stats of all matches of the club.
+        Matches already seen (e.g. from the other club) are not parsed again.
         """
         raw_response = self._get("MATCHES_STATS", input_data)
-        return [Match(**match_dict) for match_dict in raw_response]
+        return get_match_registry().resolve_all(raw_response)
 
     def club_info(self, input_data: BaseModel) -> ClubInfo:
         """
         Gets information of a club.
         The response is keyed by `clubId`.
         """
-        raw_response = self._get("CLUB_INFO", input_data)
-        return ClubInfo.parse_obj(raw_response)
+        return self._get("CLUB_INFO", input_data, parse=ClubInfo.parse_obj)
@@ -0,0 +1,61 @@
+# fc_clubs_api/deadline.py
+
+import contextvars
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+import requests
+
+# Absolute time.monotonic() by which the current operation has to finish
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar(
+    "ea_deadline", default=None
+)
+
+
+class DeadlineExceeded(requests.exceptions.Timeout):
+    """
+    The time budget of the current operation ran out before an EA request
+    could be (fully) sent. Handled like any other request timeout.
+    """
+
+
+@contextmanager
+def deadline(seconds: float) -> Iterator[None]:
+    """
+    Gives the EA requests made inside the block (in this thread or task, and
+    in threads started with a copy of its context) `seconds` in total. A
+    nested deadline can only shorten the outer one.
+    """
+    new_deadline = time.monotonic() + seconds
+    outer = _deadline.get()
+    if outer is not None:
+        new_deadline = min(new_deadline, outer)
+    token = _deadline.set(new_deadline)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining() -> Optional[float]:
+    """
+    Seconds left until the current deadline, or None without one.
+    """
+    current = _deadline.get()
+    return None if current is None else current - time.monotonic()
+
+
+def request_timeout(default: float) -> float:
+    """
+    Timeout for the next request: `default`, capped by what is left of the deadline.
+
+    Raises:
+        DeadlineExceeded: The deadline has already passed.
+    """
+    left = remaining()
+    if left is None:
+        return default
+    if left <= 0:
+        raise DeadlineExceeded("Deadline exceeded before the request was sent")
+    return min(default, left)
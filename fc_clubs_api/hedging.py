@@ -0,0 +1,204 @@
+# fc_clubs_api/hedging.py
+
+import contextvars
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Callable, Deque, Dict, Optional, TypeVar
+
+from .metrics import EA_HEDGES
+
+T = TypeVar("T")
+
+
+class LatencyTracker:
+    """
+    Recent latencies of one route; the percentile is recomputed every
+    `refresh_every` observations instead of on every request.
+    """
+
+    def __init__(self, window: int = 200, refresh_every: int = 20):
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._refresh_every = refresh_every
+        self._since_refresh = 0
+        self._percentiles: Dict[float, float] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+            self._since_refresh += 1
+            if self._since_refresh >= self._refresh_every:
+                self._since_refresh = 0
+                self._percentiles.clear()
+
+    def percentile(self, q: float, min_samples: int) -> Optional[float]:
+        with self._lock:
+            if len(self._samples) < min_samples:
+                return None
+            value = self._percentiles.get(q)
+            if value is None:
+                ordered = sorted(self._samples)
+                value = self._percentiles[q] = ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+            return value
+
+
+class HedgePolicy:
+    """
+    Sends a second copy of a slow idempotent GET and uses whichever answers first.
+
+    A request is hedged once it has been running longer than the `percentile`
+    of its route's recent latencies. Each request earns `max_ratio` hedge
+    credits (up to `burst`), and a hedge spends one, so at most that share of
+    requests is duplicated. Hedges also need a free slot in the request
+    scheduler and one of the hedge workers; they never wait for either.
+
+    The first copy is sent from its own thread, started when the request is,
+    so the hedge timer and the latency samples both count from the moment
+    the request is actually sent, never from time spent queued.
+
+    Configured from the environment:
+        EA_HEDGE_PERCENTILE: e.g. 0.95 to hedge at p95 (default 0, hedging off).
+        EA_HEDGE_MAX_RATIO: hedges per request (default 0.05).
+        EA_HEDGE_MIN_SAMPLES: latencies observed before hedging starts (default 20).
+        EA_HEDGE_MAX_INFLIGHT: hedges sent at a time (default 4).
+    """
+
+    def __init__(self, percentile: Optional[float] = None, max_ratio: Optional[float] = None,
+                 min_samples: Optional[int] = None, burst: float = 5.0,
+                 max_inflight: Optional[int] = None):
+        self.percentile = float(os.getenv("EA_HEDGE_PERCENTILE", "0")) if percentile is None else percentile
+        self.max_ratio = float(os.getenv("EA_HEDGE_MAX_RATIO", "0.05")) if max_ratio is None else max_ratio
+        self.min_samples = int(os.getenv("EA_HEDGE_MIN_SAMPLES", "20")) if min_samples is None else min_samples
+        self.burst = burst
+        self.max_inflight = max(1, int(os.getenv("EA_HEDGE_MAX_INFLIGHT", "4"))
+                                if max_inflight is None else max_inflight)
+        self._hedge_slots = threading.BoundedSemaphore(self.max_inflight)
+        self._credits = 0.0
+        self._trackers: Dict[str, LatencyTracker] = {}
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    @property
+    def enabled(self) -> bool:
+        return 0 < self.percentile < 1
+
+    def tracker(self, route: str) -> LatencyTracker:
+        tracker = self._trackers.get(route)
+        if tracker is None:
+            with self._lock:
+                tracker = self._trackers.setdefault(route, LatencyTracker())
+        return tracker
+
+    def _earn_credit(self):
+        with self._lock:
+            self._credits = min(self.burst, self._credits + self.max_ratio)
+
+    def _spend_credit(self) -> bool:
+        with self._lock:
+            if self._credits < 1:
+                return False
+            self._credits -= 1
+            return True
+
+    @staticmethod
+    def _start_primary(call: Callable[[], T]) -> Future:
+        future: Future = Future()
+
+        def run():
+            try:
+                future.set_result(call())
+            except BaseException as e:
+                future.set_exception(e)
+
+        # Keep the caller's trace, priority and deadline in the thread
+        threading.Thread(
+            target=contextvars.copy_context().run, args=(run,), name="ea-request", daemon=True
+        ).start()
+        return future
+
+    def _submit_hedge(self, call: Callable[[], T]) -> Future:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_inflight, thread_name_prefix="ea-hedge"
+                    )
+        # A slot is taken per hedge, so a hedge always finds an idle worker
+        future = self._executor.submit(contextvars.copy_context().run, call)
+        future.add_done_callback(lambda _: self._hedge_slots.release())
+        return future
+
+    def call(self, route: str, send: Callable[[], T], may_hedge: Callable[[], bool]) -> T:
+        """
+        Runs `send()` and, if it is slow, a second `send()` in parallel.
+
+        Args:
+            route (str): Route name, latencies are tracked per route.
+            send (Callable[[], T]): Sends the request; safe to call twice.
+            may_hedge (Callable[[], bool]): Reserves a slot for the hedge, False if none is free.
+
+        Returns:
+            T: The first successful result. If both copies fail, the first error is raised.
+        """
+        self._earn_credit()
+        tracker = self.tracker(route)
+        threshold = tracker.percentile(self.percentile, self.min_samples)
+
+        def timed_send() -> T:
+            start = time.perf_counter()
+            result = send()
+            tracker.observe(time.perf_counter() - start)
+            return result
+
+        if threshold is None:
+            return timed_send()
+
+        primary = self._start_primary(timed_send)
+        if wait([primary], timeout=threshold).done:
+            return primary.result()
+
+        if not self._spend_credit():
+            EA_HEDGES.labels(route, "rate_limited").inc()
+            return primary.result()
+        if not self._hedge_slots.acquire(blocking=False):
+            with self._lock:
+                self._credits += 1  # Not spent after all
+            EA_HEDGES.labels(route, "no_slot").inc()
+            return primary.result()
+        if not may_hedge():
+            self._hedge_slots.release()
+            with self._lock:
+                self._credits += 1
+            EA_HEDGES.labels(route, "no_slot").inc()
+            return primary.result()
+
+        EA_HEDGES.labels(route, "sent").inc()
+        hedge = self._submit_hedge(timed_send)
+        pending = {primary, hedge}
+        first_error: Optional[BaseException] = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                error = future.exception()
+                if error is None:
+                    if future is hedge:
+                        EA_HEDGES.labels(route, "won").inc()
+                    return future.result()
+                first_error = first_error or error
+        raise first_error
+
+
+_policy: Optional[HedgePolicy] = None
+_policy_lock = threading.Lock()
+
+
+def get_hedge_policy() -> HedgePolicy:
+    global _policy
+    if _policy is None:
+        with _policy_lock:
+            if _policy is None:
+                _policy = HedgePolicy()
+    return _policy
@@ -0,0 +1,128 @@
+# fc_clubs_api/match_registry.py
+
+import sys
+import threading
+import weakref
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from pydantic import BaseModel
+
+from .memory import ByteBudgetCache, estimate_size
+from .metrics import record_cache_lookup
+from .models import CustomKit, Match, MatchClubsDetails, MatchTimeAgo
+
+
+def _intern_fields(model: BaseModel) -> BaseModel:
+    # Field values are replaced in place, the model is not re-validated
+    fields = model.__dict__
+    for name, value in fields.items():
+        if type(value) is str:
+            fields[name] = sys.intern(value)
+    return model
+
+
+class MatchRegistry:
+    """
+    Parsed matches by matchId, shared by every club that played them.
+
+    A played match does not change, so a match that is already registered is
+    returned as is instead of being validated again (only its `timeAgo` is
+    refreshed). New matches are interned before they are registered: their
+    strings go through sys.intern, and identical kits and club details are
+    shared between matches. Matches are shared between callers and must be
+    treated as read-only.
+
+    Matches are kept within the CACHE_BUDGET_MATCH_REGISTRY byte budget
+    (default 32MB), least recently used dropped first.
+    """
+
+    def __init__(self):
+        self._matches: ByteBudgetCache[str, Match] = ByteBudgetCache("match_registry", "32MB")
+        # Kits and details live as long as a registered match uses them
+        self._kits: "weakref.WeakValueDictionary[Tuple, CustomKit]" = weakref.WeakValueDictionary()
+        self._details: "weakref.WeakValueDictionary[Tuple, MatchClubsDetails]" = weakref.WeakValueDictionary()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._matches)
+
+    def get(self, match_id: str) -> Optional[Match]:
+        return self._matches.get(str(match_id))
+
+    def resolve(self, raw: Dict[str, Any]) -> Match:
+        """
+        Returns the registered match for a raw `clubs/matches` entry,
+        validating and registering it if it is new.
+
+        Raises:
+            pydantic.ValidationError: The entry is new and not a valid match.
+        """
+        match_id = str(raw["matchId"])
+        match = self._matches.get(match_id)
+        record_cache_lookup("match_registry", match is not None)
+        if match is not None:
+            time_ago = raw.get("timeAgo")
+            if time_ago and (time_ago.get("number"), time_ago.get("unit")) != (
+                match.timeAgo.number, match.timeAgo.unit
+            ):
+                match.__dict__["timeAgo"] = MatchTimeAgo.parse_obj(time_ago)
+            return match
+
+        match = self._intern(Match.parse_obj(raw))
+        size = estimate_size(match)
+        with self._lock:
+            # Another thread may have registered it meanwhile, keep the first
+            registered = self._matches.get(match_id)
+            if registered is not None:
+                return registered
+            self._matches.put(match_id, match, size)
+        return match
+
+    def resolve_all(self, raw_matches: Iterable[Dict[str, Any]]) -> List[Match]:
+        return [self.resolve(raw) for raw in raw_matches]
+
+    def _intern(self, match: Match) -> Match:
+        _intern_fields(match)
+        intern = sys.intern
+        for club in match.clubs.values():
+            _intern_fields(club)
+            if club.details is not None:
+                club.__dict__["details"] = self._shared_details(club.details)
+        for players in match.players.values():
+            for player in players.values():
+                _intern_fields(player)
+        match.__dict__["clubs"] = {intern(k): v for k, v in match.clubs.items()}
+        match.__dict__["players"] = {
+            intern(club_id): {intern(player_id): p for player_id, p in players.items()}
+            for club_id, players in match.players.items()
+        }
+        match.__dict__["aggregate"] = {intern(k): v for k, v in match.aggregate.items()}
+        return match
+
+    def _shared_details(self, details: MatchClubsDetails) -> MatchClubsDetails:
+        kit_key = tuple(details.customKit.__dict__.values())
+        details_key = (details.name, details.clubId, details.regionId, details.teamId, kit_key)
+        with self._lock:
+            shared = self._details.get(details_key)
+            if shared is not None:
+                return shared
+            kit = self._kits.get(kit_key)
+            if kit is None:
+                kit = self._kits[kit_key] = _intern_fields(details.customKit)
+            _intern_fields(details)
+            details.__dict__["customKit"] = kit
+            self._details[details_key] = details
+            return details
+
+
+_registry: Optional[MatchRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_match_registry() -> MatchRegistry:
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = MatchRegistry()
+    return _registry
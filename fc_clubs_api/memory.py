@@ -0,0 +1,199 @@
+# fc_clubs_api/memory.py
+
+import os
+import re
+import sys
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Generic, Hashable, Iterator, Optional, Tuple, TypeVar, Union
+
+from pydantic import BaseModel
+
+from .metrics import CACHE_BYTES, CACHE_EVICTIONS
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+_ATOMS = (str, bytes, int, float, bool, type(None))
+_UNITS = {"": 1, "B": 1, "KB": 1024, "MB": 1024 ** 2, "GB": 1024 ** 3}
+
+
+def parse_size(value: Union[str, int]) -> int:
+    """
+    Parses a byte size such as 1048576, "512KB" or "16MB".
+    """
+    if isinstance(value, int):
+        return value
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([KMG]?B?)\s*", value.upper())
+    if not match:
+        raise ValueError(f"Not a byte size: {value!r}")
+    return int(float(match.group(1)) * _UNITS[match.group(2)])
+
+
+def estimate_size(obj: Any) -> int:
+    """
+    Approximate bytes held by an object and everything it references:
+    containers, pydantic models, objects with a __dict__, and numpy arrays
+    (whose getsizeof includes their data). An object referenced twice is
+    counted once. Objects shared with other cache entries (interned strings,
+    shared kits) are counted in each entry, so the estimate errs high.
+    """
+    seen = set()
+    stack = [obj]
+    total = 0
+    while stack:
+        item = stack.pop()
+        if id(item) in seen:
+            continue
+        seen.add(id(item))
+        total += sys.getsizeof(item)
+        if isinstance(item, _ATOMS):
+            continue
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple, set, frozenset)):
+            stack.extend(item)
+        elif isinstance(item, BaseModel):
+            stack.append(item.__dict__)
+        elif hasattr(item, "__dict__") and not isinstance(item, type):
+            stack.append(item.__dict__)
+    return total
+
+
+_caches: "weakref.WeakValueDictionary[str, ByteBudgetCache]" = weakref.WeakValueDictionary()
+# Indexes that manage their own budget: name -> function returning their usage
+_indexes: Dict[str, Callable[[], Dict[str, Any]]] = {}
+
+
+class ByteBudgetCache(Generic[K, V]):
+    """
+    LRU mapping that evicts by the estimated bytes of its values instead of
+    their number. A value larger than the whole budget is not kept.
+
+    The budget is read from CACHE_BUDGET_<NAME> (e.g. CACHE_BUDGET_REPORT=32MB)
+    and defaults to `default_budget`; 0 disables the cache. Every cache is
+    listed by cache_usage().
+    """
+
+    def __init__(self, name: str, default_budget: Union[str, int],
+                 sizeof: Callable[[Any], int] = estimate_size):
+        self.name = name
+        self.max_bytes = parse_size(os.getenv(f"CACHE_BUDGET_{name.upper()}", default_budget))
+        self.sizeof = sizeof
+        self.bytes = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[K, Tuple[V, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes_gauge = CACHE_BYTES.labels(name)
+        self._evictions_counter = CACHE_EVICTIONS.labels(name)
+        _caches[name] = self
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: K) -> bool:
+        return key in self._entries
+
+    def keys(self) -> Iterator[K]:
+        with self._lock:
+            return iter(list(self._entries))
+
+    def get(self, key: K, default: Optional[V] = None) -> Optional[V]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key: K, value: V, size: Optional[int] = None) -> bool:
+        """
+        Stores a value (again, to re-account a value that grew), evicting the
+        least recently used entries to stay within the budget.
+
+        Returns:
+            bool: False if the value alone is over the budget and was not kept.
+        """
+        size = self.sizeof(value) if size is None else size
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.bytes -= old[1]
+            if size > self.max_bytes:
+                self._bytes_gauge.set(self.bytes)
+                return False
+            self._entries[key] = (value, size)
+            self.bytes += size
+            evicted = 0
+            while self.bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.bytes -= evicted_size
+                evicted += 1
+            self.evictions += evicted
+            self._bytes_gauge.set(self.bytes)
+        if evicted:
+            self._evictions_counter.inc(evicted)
+        return True
+
+    def pop(self, key: K, default: Optional[V] = None) -> Optional[V]:
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                return default
+            self.bytes -= entry[1]
+            self._bytes_gauge.set(self.bytes)
+            return entry[0]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+            self._bytes_gauge.set(0)
+
+    def usage(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "evictions": self.evictions,
+            }
+
+
+def register_index(name: str, usage: Callable[[], Dict[str, Any]]):
+    """
+    Lists an index that is not a ByteBudgetCache, but keeps itself within a
+    budget, in cache_usage(). `usage` returns the same fields as
+    ByteBudgetCache.usage().
+    """
+    _indexes[name] = usage
+
+
+def cache_usage() -> Dict[str, Any]:
+    """
+    Entries, estimated bytes, budget and evictions of every cache and
+    registered index, and totals.
+    """
+    caches = {name: cache.usage() for name, cache in sorted(_caches.items())}
+    for name, usage in sorted(_indexes.items()):
+        caches[name] = usage()
+    return {
+        "caches": caches,
+        "bytes": sum(usage["bytes"] for usage in caches.values()),
+        "max_bytes": sum(usage["max_bytes"] for usage in caches.values()),
+    }
+
+
+def format_cache_usage(usage: Dict[str, Any]) -> str:
+    def mb(value: int) -> str:
+        return f"{value / 1024 ** 2:.1f} MB"
+
+    lines = [
+        f"{name}: {cache['entries']} entries, {mb(cache['bytes'])} of {mb(cache['max_bytes'])}, "
+        f"{cache['evictions']} evicted"
+        for name, cache in usage["caches"].items()
+    ]
+    lines.append(f"Total: {mb(usage['bytes'])} of {mb(usage['max_bytes'])}")
+    return "\n".join(lines)
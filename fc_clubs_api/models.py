@@ -1,11 +1,15 @@
 # fc_clubs_api/models.py
 
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 from typing import Dict, List,Optional
 
+class ApiModel(BaseModel):
+    # Schemas are built on first use (or by build_models), not at import time
+    model_config = ConfigDict(defer_build=True)
+
 # --- Custom Models ---
 
-class CustomKit(BaseModel):
+class CustomKit(ApiModel):
     stadName: str
     kitId: str
     seasonalTeamId: str
@@ -31,7 +35,7 @@ class CustomKit(BaseModel):
     crestColor: str
     crestAssetId: str
 
-class SingleClubInfo(BaseModel):
+class SingleClubInfo(ApiModel):
     name: str
     clubId: int
     regionId: int
@@ -40,7 +44,7 @@ class SingleClubInfo(BaseModel):
 
 # --- Updated ClubInfo as a Standard BaseModel ---
 
-class ClubInfo(BaseModel):
+class ClubInfo(ApiModel):
     name: str
     clubId: int
     regionId: int
@@ -49,7 +53,7 @@ class ClubInfo(BaseModel):
 
 # --- Other Models ---
 
-class Club(BaseModel):
+class Club(ApiModel):
     clubId: str
     wins: str
     losses: str
@@ -66,7 +70,7 @@ class Club(BaseModel):
     clubName: str
     currentDivision: str
 
-class OverallStats(BaseModel):
+class OverallStats(ApiModel):
     clubId: str
     bestDivision: Optional[str] = None
     bestFinishGroup: Optional[str] = None
@@ -110,7 +114,7 @@ class OverallStats(BaseModel):
     skillRating: str
     reputationtier: str
     leagueAppearances: str
-class MemberCareerStatsMember(BaseModel):
+class MemberCareerStatsMember(ApiModel):
     name: str
     proPos: str
     gamesPlayed: str
@@ -121,17 +125,17 @@ class MemberCareerStatsMember(BaseModel):
     prevGoals: str
     favoritePosition: str
 
-class MemberCareerStatsPositionCount(BaseModel):
+class MemberCareerStatsPositionCount(ApiModel):
     midfielder: int
     goalkeeper: int
     forward: int
     defender: int
 
-class MemberCareerStats(BaseModel):
+class MemberCareerStats(ApiModel):
     members: List[MemberCareerStatsMember]
     positionCount: MemberCareerStatsPositionCount
 
-class MemberStatsMember(BaseModel):
+class MemberStatsMember(ApiModel):
     name: str
     gamesPlayed: str
     winRate: str
@@ -166,24 +170,24 @@ class MemberStatsMember(BaseModel):
     prevGoals10: str
     favoritePosition: str
 
-class MemberStatsPositionCount(BaseModel):
+class MemberStatsPositionCount(ApiModel):
     midfielder: int
     goalkeeper: int
     forward: int
     defender: int
 
-class MemberStats(BaseModel):
+class MemberStats(ApiModel):
     members: List[MemberStatsMember]
     positionCount: MemberStatsPositionCount
 
-class MatchClubsDetails(BaseModel):
+class MatchClubsDetails(ApiModel):
     name: str
     clubId: int
     regionId: int
     teamId: int
     customKit: CustomKit
 
-class MatchClubsData(BaseModel):
+class MatchClubsData(ApiModel):
     date: str
     gameNumber: str
     goals: str
@@ -200,11 +204,11 @@ class MatchClubsData(BaseModel):
     details: Optional[MatchClubsDetails] = None  # Updated to be optional
 
 
-class MatchTimeAgo(BaseModel):
+class MatchTimeAgo(ApiModel):
     number: int
     unit: str
 
-class MatchPlayersStats(BaseModel):
+class MatchPlayersStats(ApiModel):
     assists: str
     cleansheetsany: str
     cleansheetsdef: str
@@ -231,7 +235,7 @@ class MatchPlayersStats(BaseModel):
     wins: str
     playername: str
 
-class MatchAggregateStats(BaseModel):
+class MatchAggregateStats(ApiModel):
     assists: int
     cleansheetsany: int
     cleansheetsdef: int
@@ -257,10 +261,18 @@ class MatchAggregateStats(BaseModel):
     vprohackreason: int
     wins: int
 
-class Match(BaseModel):
+class Match(ApiModel):
     matchId: str
     timestamp: int
     timeAgo: MatchTimeAgo
     clubs: Dict[str, MatchClubsData]
     players: Dict[str, Dict[str, MatchPlayersStats]]
     aggregate: Dict[str, MatchAggregateStats]
+
+
+def build_models():
+    """
+    Builds the schemas of the response models ahead of their first use.
+    """
+    for model in (Club, OverallStats, MemberCareerStats, MemberStats, Match, ClubInfo):
+        model.model_rebuild()
@@ -0,0 +1,73 @@
+# fc_clubs_api/revalidation.py
+
+import hashlib
+import threading
+from typing import Any, Dict, Hashable, NamedTuple, Optional
+
+from .memory import ByteBudgetCache
+
+
+class Validated(NamedTuple):
+    """
+    A parsed response together with what is needed to revalidate it.
+    """
+    etag: Optional[str]
+    last_modified: Optional[str]
+    body_hash: bytes
+    parsed: Any
+
+
+def body_hash(content: bytes) -> bytes:
+    return hashlib.blake2b(content, digest_size=16).digest()
+
+
+class ValidatorCache:
+    """
+    Last parsed response per request, so an unchanged response is not decoded
+    and validated again. Requests are sent with If-None-Match/If-Modified-Since
+    when EA gave validators; a 304, or a 200 whose body hashes the same as
+    before, returns the parsed model kept here. Parsed models are shared
+    between callers and must be treated as read-only.
+
+    Entries are kept within the CACHE_BUDGET_EA_REVALIDATE byte budget
+    (default 16MB, 0 disables revalidation).
+    """
+
+    def __init__(self):
+        self._entries: ByteBudgetCache[Hashable, Validated] = ByteBudgetCache("ea_revalidate", "16MB")
+
+    @property
+    def enabled(self) -> bool:
+        return self._entries.max_bytes > 0
+
+    def get(self, key: Hashable) -> Optional[Validated]:
+        return self._entries.get(key)
+
+    def put(self, key: Hashable, entry: Validated, size: Optional[int] = None):
+        self._entries.put(key, entry, size)
+
+    def clear(self):
+        self._entries.clear()
+
+    @staticmethod
+    def conditional_headers(entry: Optional[Validated]) -> Dict[str, str]:
+        headers = {}
+        if entry is not None:
+            if entry.etag:
+                headers["If-None-Match"] = entry.etag
+            if entry.last_modified:
+                headers["If-Modified-Since"] = entry.last_modified
+        return headers
+
+
+_cache: Optional[ValidatorCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_validator_cache() -> ValidatorCache:
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ValidatorCache()
+    return _cache
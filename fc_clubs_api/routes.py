@@ -28,6 +28,8 @@ class RouteConfig(BaseModel):
 
     url: str
     input_model: Type[BaseModel]
+    # Responses change rarely: send conditional requests and reuse the parsed model
+    revalidate: bool = False
 
     # For Pydantic v2:
     model_config = ConfigDict(arbitrary_types_allowed=True)
@@ -40,7 +42,8 @@ ROUTES: Dict[TRouteName, RouteConfig] = {
     ),
     "OVERALL_STATS": RouteConfig(
         url="clubs/overallStats",
-        input_model=OverallStatsInput
+        input_model=OverallStatsInput,
+        revalidate=True
     ),
     "MEMBER_CAREER_STATS": RouteConfig(
         url="members/career/stats",
@@ -56,6 +59,7 @@ ROUTES: Dict[TRouteName, RouteConfig] = {
     ),
     "CLUB_INFO": RouteConfig(
         url="clubs/info",
-        input_model=ClubInfoInput
+        input_model=ClubInfoInput,
+        revalidate=True
     ),
 }
@@ -0,0 +1,143 @@
+# fc_clubs_api/scheduler.py
+
+import contextvars
+import enum
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Deque, Dict, Iterator, Optional
+
+from .metrics import EA_QUEUE_DEPTH, EA_QUEUE_WAIT_SECONDS
+
+
+class Priority(enum.IntEnum):
+    """
+    Priority classes of EA requests, most urgent first.
+    """
+    INTERACTIVE = 0  # A user is waiting for the reply
+    BACKGROUND = 1  # Broadcasts, batch jobs, cache warming
+
+
+_priority: contextvars.ContextVar[Priority] = contextvars.ContextVar(
+    "ea_priority", default=Priority.BACKGROUND
+)
+
+
+def current_priority() -> Priority:
+    return _priority.get()
+
+
+@contextmanager
+def priority(value: Priority) -> Iterator[None]:
+    """
+    Runs the EA requests made inside the block (in this thread or task) with
+    the given priority. Requests default to BACKGROUND.
+    """
+    token = _priority.set(value)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class RequestScheduler:
+    """
+    Token bucket shared by all EA requests of the process, handed out in
+    priority order: a request only gets a token when no request of a more
+    urgent class is waiting, and requests of one class are served FIFO.
+
+    Configured from the environment:
+        EA_RATE_LIMIT: requests per second (default 20, 0 disables the limit).
+        EA_RATE_BURST: bucket size (default: one second of requests).
+    """
+
+    def __init__(self, rate: Optional[float] = None, burst: Optional[float] = None):
+        self.rate = float(os.getenv("EA_RATE_LIMIT", "20")) if rate is None else rate
+        if burst is None:
+            burst = float(os.getenv("EA_RATE_BURST", "0")) or max(1.0, self.rate)
+        self.burst = burst
+        self._tokens = self.burst
+        self._refilled_at = time.monotonic()
+        self._condition = threading.Condition()
+        self._queues: Dict[Priority, Deque[object]] = {p: deque() for p in Priority}
+        self._depth = {p: EA_QUEUE_DEPTH.labels(p.name.lower()) for p in Priority}
+        self._wait = {p: EA_QUEUE_WAIT_SECONDS.labels(p.name.lower()) for p in Priority}
+
+    def _refill(self, now: float):
+        self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rate)
+        self._refilled_at = now
+
+    def _is_next(self, level: Priority, ticket: object) -> bool:
+        for other in Priority:
+            if other == level:
+                return self._queues[level][0] is ticket
+            if self._queues[other]:
+                return False
+        return False
+
+    def acquire(self, level: Optional[Priority] = None, timeout: Optional[float] = None) -> float:
+        """
+        Blocks until the request may be sent.
+
+        Returns:
+            float: Seconds spent waiting.
+
+        Raises:
+            TimeoutError: No slot was free within `timeout` seconds.
+        """
+        level = current_priority() if level is None else level
+        start = time.monotonic()
+        give_up_at = start + timeout if timeout is not None else None
+        if self.rate <= 0:
+            self._wait[level].observe(0.0)
+            return 0.0
+
+        ticket = object()
+        with self._condition:
+            queue = self._queues[level]
+            queue.append(ticket)
+            self._depth[level].inc()
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    is_next = self._is_next(level, ticket)
+                    if is_next and self._tokens >= 1:
+                        self._tokens -= 1
+                        break
+                    # The next in line wakes up when its token is due, the
+                    # others when a request ahead of them leaves the queue
+                    wait = max((1 - self._tokens) / self.rate, 0.001) if is_next else None
+                    if give_up_at is not None:
+                        if now >= give_up_at:
+                            self._wait[level].observe(now - start)
+                            raise TimeoutError("No EA request slot within the deadline")
+                        wait = give_up_at - now if wait is None else min(wait, give_up_at - now)
+                    self._condition.wait(wait)
+            finally:
+                queue.remove(ticket)
+                self._depth[level].dec()
+                self._condition.notify_all()
+
+        waited = time.monotonic() - start
+        self._wait[level].observe(waited)
+        return waited
+
+
+_scheduler: Optional[RequestScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> RequestScheduler:
+    """
+    Returns the process-wide scheduler, created on first use so that the
+    environment (.env) is loaded by then.
+    """
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = RequestScheduler()
+    return _scheduler
@@ -0,0 +1,179 @@
+# fc_clubs_api/tracing.py
+
+import contextvars
+import functools
+import inspect
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar(
+    "current_span", default=None
+)
+
+
+class Span:
+    __slots__ = (
+        "trace_id", "span_id", "parent_id", "name", "sampled",
+        "attributes", "start_time", "_start", "duration", "error",
+    )
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], sampled: bool):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.sampled = sampled
+        self.attributes: Dict[str, Any] = {}
+        self.start_time = time.time()
+        self._start = time.perf_counter()
+        self.duration: Optional[float] = None
+        self.error: Optional[str] = None
+
+    def set_attribute(self, key: str, value: Any):
+        if self.sampled:
+            self.attributes[key] = value
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self.start_time,
+            "duration_ms": round(self.duration * 1000, 3) if self.duration is not None else None,
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+class _Tracer:
+    """
+    Configured from the environment:
+        TRACE_SAMPLE_RATE: share of traces that are recorded (default 0.05).
+        TRACE_EXPORTER: "none", "console" or "jsonl" (default "none").
+        TRACE_FILE: output file of the jsonl exporter (default traces.jsonl).
+    Trace IDs are assigned to every trace, sampled or not, so they can always
+    be correlated with log lines.
+    """
+
+    def __init__(self):
+        self.sample_rate = float(os.getenv("TRACE_SAMPLE_RATE", "0.05"))
+        self.exporter = os.getenv("TRACE_EXPORTER", "none").lower()
+        self.path = os.getenv("TRACE_FILE", "traces.jsonl")
+        self._file = None
+        self._lock = threading.Lock()
+
+    def export(self, span: Span):
+        if self.exporter == "none":
+            return
+        line = json.dumps(span.to_dict(), default=str)
+        with self._lock:
+            if self.exporter == "console":
+                sys.stderr.write(line + "\n")
+            elif self.exporter == "jsonl":
+                if self._file is None:
+                    self._file = open(self.path, "a", encoding="utf-8", buffering=1)
+                self._file.write(line + "\n")
+
+
+_tracer: Optional[_Tracer] = None
+
+
+def get_tracer() -> _Tracer:
+    # Created lazily so it sees environment variables loaded by dotenv
+    global _tracer
+    if _tracer is None:
+        _tracer = _Tracer()
+    return _tracer
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def current_trace_id() -> Optional[str]:
+    span = _current_span.get()
+    return span.trace_id if span else None
+
+
+@contextmanager
+def span(name: str, **attributes) -> Iterator[Span]:
+    """
+    Opens a span. Without an active span this starts a new trace, and the
+    sampling decision is made once per trace.
+    """
+    parent = _current_span.get()
+    if parent is None:
+        tracer = get_tracer()
+        new_span = Span(
+            name,
+            trace_id=f"{random.getrandbits(64):016x}",
+            parent_id=None,
+            sampled=random.random() < tracer.sample_rate,
+        )
+    else:
+        new_span = Span(name, parent.trace_id, parent.span_id, parent.sampled)
+    if new_span.sampled and attributes:
+        new_span.attributes.update(attributes)
+
+    token = _current_span.set(new_span)
+    try:
+        yield new_span
+    except BaseException as e:
+        new_span.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current_span.reset(token)
+        if new_span.sampled:
+            new_span.duration = time.perf_counter() - new_span._start
+            get_tracer().export(new_span)
+
+
+def traced(name: str):
+    """
+    Decorator that runs the function (sync or async) inside a span.
+    """
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+
+    return decorator
+
+
+class TraceIdFilter(logging.Filter):
+    """
+    Adds `trace_id` to every log record ("-" outside of a trace).
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        span = _current_span.get()
+        record.trace_id = span.trace_id if span else "-"
+        return True
+
+
+def install_log_filter(logger: Optional[logging.Logger] = None):
+    """
+    Attaches TraceIdFilter to the handlers of `logger` (the root logger by
+    default), so `%(trace_id)s` can be used in their format.
+    """
+    logger = logger or logging.getLogger()
+    for handler in logger.handlers:
+        if not any(isinstance(f, TraceIdFilter) for f in handler.filters):
+            handler.addFilter(TraceIdFilter())
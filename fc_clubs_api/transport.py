@@ -0,0 +1,121 @@
+# fc_clubs_api/transport.py
+
+import logging
+import os
+import threading
+from typing import Any, Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+
+class RequestsTransport:
+    """
+    HTTP/1.1 through one shared requests.Session, so connections are kept
+    alive and reused instead of opened per request.
+    """
+    name = "http1"
+
+    def __init__(self, pool_size: int = 32):
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+
+    def get(self, url: str, headers: Dict[str, str], params: Dict[str, str], timeout: float):
+        return self._session.get(url, headers=headers, params=params, timeout=timeout)
+
+    def close(self):
+        self._session.close()
+
+
+class _HttpxResponse:
+    """
+    The parts of requests.Response the API layer uses, with requests' exceptions.
+    """
+
+    def __init__(self, response):
+        self._response = response
+        self.status_code = response.status_code
+        self.headers = response.headers
+        self.content = response.content
+        self.http_version = response.http_version
+
+    def json(self) -> Any:
+        return self._response.json()
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(
+                f"{self.status_code} Error for url: {self._response.url}", response=self
+            )
+
+
+class Http2Transport:
+    """
+    HTTP/2 through one shared httpx client: concurrent requests to EA are
+    multiplexed over a single connection. Needs `httpx[http2]`.
+
+    With `prior_knowledge` HTTP/2 is spoken over cleartext without
+    negotiation (for the local EA stand-in); otherwise it is negotiated with
+    ALPN and servers without HTTP/2 get HTTP/1.1.
+    """
+    name = "http2"
+
+    def __init__(self, prior_knowledge: bool = False, max_connections: int = 32):
+        import httpx
+        import h2  # noqa: F401  (httpx only speaks HTTP/2 with it installed)
+
+        self._httpx = httpx
+        self._client = httpx.Client(
+            http1=not prior_knowledge,
+            http2=True,
+            limits=httpx.Limits(max_connections=max_connections),
+        )
+
+    def get(self, url: str, headers: Dict[str, str], params: Dict[str, str], timeout: float):
+        try:
+            response = self._client.get(url, headers=headers, params=params, timeout=timeout)
+        except self._httpx.TimeoutException as e:
+            raise requests.Timeout(str(e)) from e
+        except self._httpx.HTTPError as e:
+            raise requests.ConnectionError(str(e)) from e
+        return _HttpxResponse(response)
+
+    def close(self):
+        self._client.close()
+
+
+def create_transport(kind: Optional[str] = None):
+    """
+    Creates the transport named by `kind` or EA_HTTP_TRANSPORT: "http1"
+    (default), "http2", or "h2c" (HTTP/2 without TLS, for the local EA
+    stand-in). Falls back to HTTP/1.1 if httpx or h2 is not installed.
+    """
+    kind = (kind or os.getenv("EA_HTTP_TRANSPORT", "http1")).lower()
+    if kind in ("http2", "h2c"):
+        try:
+            return Http2Transport(prior_knowledge=kind == "h2c")
+        except ImportError as e:
+            logger.warning("HTTP/2 transport unavailable (%s), using HTTP/1.1", e)
+    elif kind != "http1":
+        logger.warning("Unknown EA_HTTP_TRANSPORT %r, using HTTP/1.1", kind)
+    return RequestsTransport()
+
+
+_transport = None
+_transport_lock = threading.Lock()
+
+
+def get_transport():
+    """
+    Returns the process-wide transport, created on first use.
+    """
+    global _transport
+    if _transport is None:
+        with _transport_lock:
+            if _transport is None:
+                _transport = create_transport()
+    return _transport
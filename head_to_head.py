@@ -0,0 +1,165 @@
+# head_to_head.py
+
+import bisect
+import html
+import logging
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+import match_store
+from fc_clubs_api.memory import ByteBudgetCache
+from fc_clubs_api.metrics import record_cache_lookup
+
+logger = logging.getLogger(__name__)
+
+
+class H2HMatch(NamedTuple):
+    timestamp: int
+    match_id: str
+    goals_low: int  # Goals of the club with the lower ID of the pair
+    goals_high: int
+
+
+def _pair(club_a: str, club_b: str) -> Tuple[str, str]:
+    return (club_a, club_b) if club_a <= club_b else (club_b, club_a)
+
+
+def _goals(club: Dict[str, Any]) -> int:
+    try:
+        return int(club.get("goals"))
+    except (TypeError, ValueError):
+        return 0
+
+
+class HeadToHeadIndex:
+    """
+    Matches between pairs of clubs, oldest first. A pair is read from the
+    match history when it is first asked for and then kept up to date from
+    new matches, within the CACHE_BUDGET_HEAD_TO_HEAD byte budget (default
+    8MB); evicted pairs are read again on their next request.
+    """
+
+    def __init__(self):
+        self._pairs: ByteBudgetCache[Tuple[str, str], List[H2HMatch]] = (
+            ByteBudgetCache("head_to_head", "8MB")
+        )
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _entry(match: Dict[str, Any], low: str, high: str) -> H2HMatch:
+        clubs = match["clubs"]
+        return H2HMatch(int(match["timestamp"]), str(match["matchId"]),
+                        _goals(clubs[low]), _goals(clubs[high]))
+
+    def add_matches(self, matches: List[Dict[str, Any]]):
+        with self._lock:
+            for match in matches:
+                if len(match["clubs"]) != 2:
+                    continue
+                pair = _pair(*match["clubs"])
+                pair_matches = self._pairs.get(pair)
+                if pair_matches is None:
+                    continue  # Read from the history when first requested
+                entry = self._entry(match, *pair)
+                if all(known.match_id != entry.match_id for known in pair_matches):
+                    bisect.insort(pair_matches, entry)
+                    self._pairs.put(pair, pair_matches)  # Accounts for the longer list
+
+    def matches(self, club_a: str, club_b: str) -> List[H2HMatch]:
+        """
+        Returns the matches between two clubs, oldest first.
+        """
+        pair = _pair(str(club_a), str(club_b))
+        with self._lock:
+            pair_matches = self._pairs.get(pair)
+            record_cache_lookup("head_to_head", pair_matches is not None)
+            if pair_matches is None:
+                pair_matches = [
+                    self._entry(match, *pair) for match in match_store.pair_matches(*pair)
+                    if len(match["clubs"]) == 2
+                ]
+                self._pairs.put(pair, pair_matches)
+            return list(pair_matches)
+
+    def record(self, club_a: str, club_b: str, last: int = 5) -> Dict[str, Any]:
+        """
+        Head-to-head record from `club_a`'s side.
+
+        Returns:
+            Dict[str, Any]: played, wins, draws, losses, goals_for, goals_against
+                            and the `last` most recent matches (newest first).
+        """
+        club_a, club_b = str(club_a), str(club_b)
+        a_is_low = club_a <= club_b
+        record = {
+            "played": 0, "wins": 0, "draws": 0, "losses": 0,
+            "goals_for": 0, "goals_against": 0, "last_matches": [],
+        }
+        results = []
+        for entry in self.matches(club_a, club_b):
+            goals_for, goals_against = (
+                (entry.goals_low, entry.goals_high) if a_is_low else (entry.goals_high, entry.goals_low)
+            )
+            result = "win" if goals_for > goals_against else "loss" if goals_for < goals_against else "draw"
+            record["played"] += 1
+            record[{"win": "wins", "draw": "draws", "loss": "losses"}[result]] += 1
+            record["goals_for"] += goals_for
+            record["goals_against"] += goals_against
+            results.append({
+                "match_id": entry.match_id,
+                "timestamp": entry.timestamp,
+                "goals_for": goals_for,
+                "goals_against": goals_against,
+                "result": result,
+            })
+        record["last_matches"] = results[::-1][:last]
+        return record
+
+
+INDEX = HeadToHeadIndex()
+match_store.add_listener(INDEX.add_matches)
+
+
+def format_head_to_head(name_a: str, name_b: str, record: Dict[str, Any]) -> str:
+    """
+    Renders a head-to-head record as Telegram HTML.
+    """
+    name_a, name_b = html.escape(name_a), html.escape(name_b)
+    if not record["played"]:
+        return f"⚠️ No stored matches between <b>{name_a}</b> and <b>{name_b}</b>."
+
+    indicators = {"win": "✅", "draw": "🤝", "loss": "❌"}
+    lines = [
+        f"⚔️ <b>{name_a}</b> vs <b>{name_b}</b>\n",
+        f"Played: {record['played']}",
+        f"{name_a} wins: {record['wins']} | Draws: {record['draws']} | {name_b} wins: {record['losses']}",
+        f"Goals: {record['goals_for']} - {record['goals_against']}\n",
+        "<b>Last results:</b>",
+    ]
+    for match in record["last_matches"]:
+        date = datetime.fromtimestamp(match["timestamp"]).strftime('%Y-%m-%d %H:%M')
+        lines.append(
+            f"{indicators[match['result']]} {match['goals_for']} - {match['goals_against']} ({date})"
+        )
+    return "\n".join(lines)
+
+
+def parse_club_pair(text: str) -> Optional[Tuple[str, str]]:
+    """
+    Splits "/h2h" arguments into two club names: `A vs B`, `A | B`, or two
+    words / quoted names.
+    """
+    import shlex
+
+    text = text.strip()
+    for separator in (" vs ", "|"):
+        if separator in text.lower():
+            index = text.lower().index(separator)
+            first, second = text[:index].strip(), text[index + len(separator):].strip()
+            return (first, second) if first and second else None
+    try:
+        parts = shlex.split(text)
+    except ValueError:
+        return None
+    return (parts[0], parts[1]) if len(parts) == 2 else None
@@ -0,0 +1,300 @@
+# loadtest/fake_ea.py
+"""
+Local stand-in for proclubs.ea.com/api/fc/ serving the recorded fixtures.
+
+Supports the routes the bot uses (club search, matches, overall stats,
+member stats) with injectable latency, including an occasional slow tail.
+With http2=True it speaks cleartext HTTP/2 with prior knowledge (h2c)
+instead of HTTP/1.1, which needs the `h2` package. Responses carry an ETag and honour
+If-None-Match unless etags=False.
+"""
+
+import copy
+import hashlib
+import json
+import random
+import socket
+import socketserver
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+FIXTURES = Path(__file__).resolve().parent.parent / "benchmarks" / "fixtures"
+API_PREFIX = "/api/fc/"
+
+
+class Latency:
+    """
+    Latency model: `base` seconds plus uniform `jitter`, and with probability
+    `tail_prob` a `tail` delay instead.
+    """
+
+    def __init__(self, base: float = 0.0, jitter: float = 0.0,
+                 tail_prob: float = 0.0, tail: float = 0.0):
+        self.base = base
+        self.jitter = jitter
+        self.tail_prob = tail_prob
+        self.tail = tail
+
+    def sample(self) -> float:
+        if self.tail_prob and random.random() < self.tail_prob:
+            return self.tail
+        return self.base + random.uniform(0, self.jitter)
+
+    def sleep(self):
+        delay = self.sample()
+        if delay > 0:
+            time.sleep(delay)
+
+
+class FakeEAServer:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0,
+                 latency: Optional[Latency] = None, http2: bool = False, etags: bool = True):
+        with open(FIXTURES / "matches.json", encoding="utf-8") as file:
+            self.matches: List[Dict[str, Any]] = json.load(file)
+        with open(FIXTURES / "overall_stats.json", encoding="utf-8") as file:
+            self.overall_stats: Dict[str, Any] = json.load(file)[0]
+
+        # Club names and details known from the recorded matches
+        self.clubs: Dict[str, Dict[str, Any]] = {}
+        for match in self.matches:
+            for club_id, club in match["clubs"].items():
+                self.clubs[club_id] = club["details"]
+        self.club_ids_by_name = {
+            details["name"].lower(): club_id for club_id, details in self.clubs.items()
+        }
+
+        self.latency = latency or Latency()
+        self.etags = etags
+        self.calls = Counter()
+        self.connections = 0
+        self.not_modified = 0
+        self._calls_lock = threading.Lock()
+        self.routes = {
+            "allTimeLeaderboard/search": self.search,
+            "clubs/matches": self.club_matches,
+            "clubs/overallStats": self.club_overall_stats,
+            "members/stats": self.member_stats,
+        }
+        if http2:
+            self._server = socketserver.ThreadingTCPServer((host, port), self._h2_handler_class())
+        else:
+            self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}{API_PREFIX}"
+
+    def start(self) -> "FakeEAServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def count(self, route: str):
+        with self._calls_lock:
+            self.calls[route] += 1
+
+    def count_connection(self):
+        with self._calls_lock:
+            self.connections += 1
+
+    def handle(self, path: str, if_none_match: Optional[str] = None) -> Tuple[int, bytes, str]:
+        """
+        Answers one GET after the configured latency: (status, JSON body, ETag).
+        A request whose If-None-Match equals the body's ETag gets an empty 304.
+        """
+        url = urlparse(path)
+        route = url.path[len(API_PREFIX):] if url.path.startswith(API_PREFIX) else url.path
+        handler = self.routes.get(route)
+        self.count(route)
+        self.latency.sleep()
+        if handler is None:
+            return 404, json.dumps({"error": "not found"}).encode("utf-8"), ""
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+        body = json.dumps(handler(params)).encode("utf-8")
+        if not self.etags:
+            return 200, body, ""
+        etag = '"%s"' % hashlib.md5(body).hexdigest()
+        if if_none_match == etag:
+            with self._calls_lock:
+                self.not_modified += 1
+            return 304, b"", etag
+        return 200, body, etag
+
+    # -- Route handlers --
+
+    def search(self, params: Dict[str, str]) -> List[Dict[str, Any]]:
+        club_id = self.club_ids_by_name.get(params.get("clubName", "").lower())
+        if club_id is None:
+            return []
+        details = self.clubs[club_id]
+        return [{
+            "clubId": club_id,
+            "wins": "220", "losses": "121", "ties": "71",
+            "gamesPlayed": "412", "gamesPlayedPlayoff": "12",
+            "goals": "1203", "goalsAgainst": "870", "cleanSheets": "96",
+            "points": "731", "reputationtier": "3",
+            "clubInfo": details,
+            "platform": params.get("platform", "common-gen5"),
+            "clubName": details["name"],
+            "currentDivision": "2",
+        }]
+
+    def club_matches(self, params: Dict[str, str]) -> List[Dict[str, Any]]:
+        club_id = params.get("clubIds", "")
+        return [match for match in self.matches if club_id in match["clubs"]]
+
+    def club_overall_stats(self, params: Dict[str, str]) -> List[Dict[str, Any]]:
+        stats = []
+        for club_id in params.get("clubIds", "").split(","):
+            if club_id in self.clubs:
+                entry = copy.copy(self.overall_stats)
+                entry["clubId"] = club_id
+                entry["skillRating"] = str(1200 + int(club_id) % 800)
+                stats.append(entry)
+        return stats
+
+    def member_stats(self, params: Dict[str, str]) -> Dict[str, Any]:
+        # The players of the club in the recorded matches, with zeroed stats
+        from fc_clubs_api.models import MemberStatsMember
+
+        club_id = params.get("clubId", "")
+        names = sorted({
+            player["playername"]
+            for match in self.matches
+            for player in match.get("players", {}).get(club_id, {}).values()
+        })
+        members = [
+            {**dict.fromkeys(MemberStatsMember.model_fields, "0"), "name": name, "proName": name}
+            for name in names
+        ]
+        return {
+            "members": members,
+            "positionCount": {"midfielder": 0, "goalkeeper": 0, "forward": 0, "defender": 0},
+        }
+
+    def _handler_class(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                # Headers and body go out in separate writes; without this a
+                # kept-alive connection waits on the client's delayed ACK
+                self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                fake.count_connection()
+
+            def do_GET(self):
+                status, data, etag = fake.handle(self.path, self.headers.get("If-None-Match"))
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                if etag:
+                    self.send_header("ETag", etag)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def _h2_handler_class(self):
+        from h2.config import H2Configuration
+        from h2.connection import H2Connection
+        from h2.events import ConnectionTerminated, RequestReceived, StreamReset, WindowUpdated
+        from h2.exceptions import H2Error
+
+        fake = self
+
+        class H2Handler(socketserver.BaseRequestHandler):
+            """
+            One HTTP/2 connection. Each stream is answered from its own thread,
+            so concurrent requests on the connection overlap like on EA.
+            """
+
+            def handle(self):
+                fake.count_connection()
+                self.conn = H2Connection(config=H2Configuration(client_side=False))
+                self.lock = threading.Condition()
+                self.closed = False
+                self.conn.initiate_connection()
+                self.flush()
+                try:
+                    while True:
+                        data = self.request.recv(65535)
+                        if not data:
+                            break
+                        with self.lock:
+                            events = self.conn.receive_data(data)
+                            for event in events:
+                                if isinstance(event, RequestReceived):
+                                    headers = dict(event.headers)
+                                    threading.Thread(
+                                        target=self.respond, args=(event.stream_id, headers), daemon=True
+                                    ).start()
+                                elif isinstance(event, (WindowUpdated, StreamReset)):
+                                    self.lock.notify_all()
+                                elif isinstance(event, ConnectionTerminated):
+                                    return
+                            self.flush()
+                except (OSError, H2Error):
+                    pass
+                finally:
+                    with self.lock:
+                        self.closed = True
+                        self.lock.notify_all()
+
+            def flush(self):
+                data = self.conn.data_to_send()
+                if data:
+                    self.request.sendall(data)
+
+            def respond(self, stream_id: int, headers: Dict[bytes, bytes]):
+                if_none_match = headers.get(b"if-none-match")
+                status, body, etag = fake.handle(
+                    headers[b":path"].decode("utf-8"),
+                    if_none_match.decode("utf-8") if if_none_match else None,
+                )
+                response_headers = [
+                    (":status", str(status)),
+                    ("content-type", "application/json"),
+                    ("content-length", str(len(body))),
+                ]
+                if etag:
+                    response_headers.append(("etag", etag))
+                try:
+                    with self.lock:
+                        self.conn.send_headers(stream_id, response_headers, end_stream=not body)
+                        # Send the body as flow control allows
+                        while body:
+                            window = min(
+                                self.conn.local_flow_control_window(stream_id),
+                                self.conn.max_outbound_frame_size,
+                            )
+                            if window <= 0:
+                                if self.closed:
+                                    return
+                                self.flush()
+                                self.lock.wait(1.0)
+                                continue
+                            chunk, body = body[:window], body[window:]
+                            self.conn.send_data(stream_id, chunk, end_stream=not body)
+                        self.flush()
+                except (OSError, H2Error):
+                    pass
+
+        return H2Handler
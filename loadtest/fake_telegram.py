@@ -0,0 +1,195 @@
+# loadtest/fake_telegram.py
+"""
+Local stand-in for the Telegram Bot API.
+
+Serves synthetic Updates to a polling bot through getUpdates, and records
+every sendMessage/sendDocument so end-to-end latency can be measured per chat.
+"""
+
+import json
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+from loadtest.fake_ea import Latency
+
+BOT_USER = {
+    "id": 1000001,
+    "is_bot": True,
+    "first_name": "LoadTestBot",
+    "username": "loadtest_bot",
+    "can_join_groups": True,
+    "can_read_all_group_messages": False,
+    "supports_inline_queries": False,
+}
+
+# Replies that are progress messages rather than the final answer
+PROGRESS_PREFIXES = ("🔍",)
+
+
+class FakeTelegramServer:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0,
+                 latency: Optional[Latency] = None):
+        self.latency = latency or Latency()
+        self.calls = Counter()
+        self._lock = threading.Condition()
+        self._updates: List[Dict[str, Any]] = []
+        self._next_update_id = 1
+        self._next_message_id = 1
+        # chat_id -> time the update was queued
+        self._pending: Dict[int, float] = {}
+        # (chat_id, latency in seconds) for every completed update
+        self.completed: List[Tuple[int, float]] = []
+        self.sent_messages = 0
+        self.first_send_at: Optional[float] = None
+        self.last_send_at: Optional[float] = None
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/bot"
+
+    def start(self) -> "FakeTelegramServer":
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    # -- Load generation side --
+
+    def push_message(self, chat_id: int, text: str):
+        """
+        Queues a private text message from `chat_id` as a new Update.
+        """
+        now = time.time()
+        message = {
+            "message_id": 1,
+            "date": int(now),
+            "chat": {"id": chat_id, "type": "private", "first_name": "Load"},
+            "from": {"id": chat_id, "is_bot": False, "first_name": "Load"},
+            "text": text,
+        }
+        if text.startswith("/"):
+            command = text.split()[0]
+            message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(command)}]
+        with self._lock:
+            self._updates.append({"update_id": self._next_update_id, "message": message})
+            self._next_update_id += 1
+            self._pending[chat_id] = time.perf_counter()
+            self._lock.notify_all()
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    # -- Bot API side --
+
+    def get_updates(self, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        offset = int(params.get("offset") or 0)
+        timeout = min(float(params.get("timeout") or 0), 1.0)
+        deadline = time.time() + timeout
+        with self._lock:
+            self._updates = [u for u in self._updates if u["update_id"] >= offset]
+            while not self._updates and time.time() < deadline:
+                self._lock.wait(deadline - time.time())
+            return list(self._updates[:100])
+
+    def record_send(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        chat_id = int(params.get("chat_id", 0))
+        text = params.get("text") or params.get("caption") or ""
+        now = time.perf_counter()
+        with self._lock:
+            self.sent_messages += 1
+            if self.first_send_at is None:
+                self.first_send_at = now
+            self.last_send_at = now
+            if not text.startswith(PROGRESS_PREFIXES) and chat_id in self._pending:
+                self.completed.append((chat_id, now - self._pending.pop(chat_id)))
+            message_id = self._next_message_id
+            self._next_message_id += 1
+        return {
+            "message_id": message_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private", "first_name": "Load"},
+            "from": BOT_USER,
+            "text": text,
+        }
+
+    def _handler_class(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                self._dispatch({})
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                self._dispatch(self._parse_body(body))
+
+            def _parse_body(self, body: bytes) -> Dict[str, Any]:
+                content_type = self.headers.get("Content-Type", "")
+                if not body:
+                    return {}
+                if "application/json" in content_type:
+                    return json.loads(body)
+                if "multipart/form-data" in content_type:
+                    # Documents: only the chat and caption matter here
+                    params = {}
+                    text = body.decode("utf-8", errors="replace")
+                    for name in ("chat_id", "caption"):
+                        marker = f'name="{name}"'
+                        if marker in text:
+                            value = text.split(marker, 1)[1].split("\r\n\r\n", 1)[1]
+                            params[name] = value.split("\r\n--", 1)[0].strip('"')
+                    return params
+                # python-telegram-bot sends form fields with JSON-encoded values
+                params = {}
+                for key, values in parse_qs(body.decode("utf-8")).items():
+                    try:
+                        params[key] = json.loads(values[0])
+                    except ValueError:
+                        params[key] = values[0]
+                return params
+
+            def _dispatch(self, params: Dict[str, Any]):
+                url = urlparse(self.path)
+                params.update({k: v[0] for k, v in parse_qs(url.query).items()})
+                method = url.path.rsplit("/", 1)[-1]
+                with fake._lock:
+                    fake.calls[method] += 1
+
+                if method == "getUpdates":
+                    result: Any = fake.get_updates(params)
+                else:
+                    fake.latency.sleep()
+                    if method == "getMe":
+                        result = BOT_USER
+                    elif method in ("sendMessage", "sendDocument"):
+                        result = fake.record_send(params)
+                    else:
+                        # deleteWebhook, setMyCommands, ...
+                        result = True
+                self._send({"ok": True, "result": result})
+
+            def _send(self, body: Any):
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
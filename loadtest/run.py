@@ -0,0 +1,240 @@
+# loadtest/run.py
+"""
+End-to-end load test for bot.py and server.py.
+
+Starts local stand-ins for the Telegram Bot API and proclubs.ea.com, runs the
+real bot or notify server as a subprocess pointed at them, drives it with
+synthetic traffic and prints a JSON summary (latency percentiles, throughput,
+upstream call counts).
+
+Usage:
+    python loadtest/run.py bot --rate 20 --duration 30 --ea-latency 0.2
+    python loadtest/run.py notify --subscribers 5000 --requests 3 --tg-latency 0.01
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+import requests
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import database  # noqa: E402
+from loadtest.fake_ea import FakeEAServer, Latency  # noqa: E402
+from loadtest.fake_telegram import FakeTelegramServer  # noqa: E402
+
+TOKEN = "123456:LOADTEST"
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def latency_summary(values: List[float]) -> Dict[str, float]:
+    return {
+        "p50_ms": percentile(values, 50) * 1000,
+        "p95_ms": percentile(values, 95) * 1000,
+        "p99_ms": percentile(values, 99) * 1000,
+        "max_ms": max(values, default=0.0) * 1000,
+    }
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_until(condition, timeout: float, what: str):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return
+        time.sleep(0.05)
+    raise TimeoutError(f"Timed out waiting for {what}")
+
+
+def spawn(script: str, workdir: str, env: Dict[str, str], log_path: Path) -> subprocess.Popen:
+    log = open(log_path, "w", encoding="utf-8")
+    return subprocess.Popen(
+        [sys.executable, str(ROOT / script)],
+        cwd=workdir,
+        env={**os.environ, "PYTHONPATH": str(ROOT), **env},
+        stdout=log,
+        stderr=subprocess.STDOUT,
+    )
+
+
+def stop(process: subprocess.Popen):
+    process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+def run_bot(args, ea: FakeEAServer, telegram: FakeTelegramServer, workdir: str) -> Dict[str, Any]:
+    process = spawn("bot.py", workdir, {
+        "TELEGRAM_BOT_TOKEN": TOKEN,
+        "TELEGRAM_API_BASE_URL": telegram.base_url,
+        "EA_API_BASE_URL": ea.base_url,
+    }, Path(workdir) / "bot.log")
+    try:
+        wait_until(lambda: telegram.calls["getUpdates"] > 0, 60, "the bot to start polling")
+
+        club_names = [args.club] if args.club else sorted({details["name"] for details in ea.clubs.values()})
+        chat_id = 10_000_000
+        interval = 1 / args.rate
+        start = time.perf_counter()
+        next_at = start
+        while time.perf_counter() - start < args.duration:
+            chat_id += 1
+            if random.random() < args.start_ratio:
+                text = "/start"
+            else:
+                text = random.choice(club_names)
+            telegram.push_message(chat_id, text)
+            next_at += random.expovariate(1 / interval) if args.poisson else interval
+            time.sleep(max(0.0, next_at - time.perf_counter()))
+        sent = chat_id - 10_000_000
+
+        # Let the bot drain what is still queued
+        try:
+            wait_until(lambda: telegram.pending_count() == 0, args.drain_timeout, "replies")
+        except TimeoutError:
+            pass
+        elapsed = time.perf_counter() - start
+    finally:
+        stop(process)
+
+    latencies = [latency for _, latency in telegram.completed]
+    return {
+        "mode": "bot",
+        "offered_rate": args.rate,
+        "duration_s": args.duration,
+        "updates_sent": sent,
+        "updates_completed": len(latencies),
+        "updates_unanswered": telegram.pending_count(),
+        "throughput_per_s": len(latencies) / elapsed if elapsed else 0.0,
+        "latency": latency_summary(latencies),
+        "upstream_calls": {"ea": dict(ea.calls), "telegram": dict(telegram.calls)},
+    }
+
+
+def run_notify(args, ea: FakeEAServer, telegram: FakeTelegramServer, workdir: str) -> Dict[str, Any]:
+    # Create the schema the server expects, then subscribe the synthetic users
+    database.DATABASE = str(Path(workdir) / "users.db")
+    database.initialize_db()
+    conn = sqlite3.connect(database.DATABASE)
+    with conn:
+        conn.executemany(
+            "INSERT OR IGNORE INTO users (user_id) VALUES (?)",
+            ((20_000_000 + i,) for i in range(args.subscribers)),
+        )
+    conn.close()
+
+    port = free_port()
+    process = spawn("server.py", workdir, {
+        "TELEGRAM_BOT_TOKEN": TOKEN,
+        "TELEGRAM_API_BASE_URL": telegram.base_url,
+        "EA_API_BASE_URL": ea.base_url,
+        "PORT": str(port),
+    }, Path(workdir) / "server.log")
+    url = f"http://127.0.0.1:{port}/notify"
+
+    def server_up() -> bool:
+        with socket.socket() as sock:
+            return sock.connect_ex(("127.0.0.1", port)) == 0
+
+    try:
+        wait_until(server_up, 60, "the notify server to start")
+        club_names = [args.club] if args.club else sorted({details["name"] for details in ea.clubs.values()})
+        latencies = []
+        failures = 0
+        start = time.perf_counter()
+        for i in range(args.requests):
+            began = time.perf_counter()
+            response = requests.post(url, json={"team_name": club_names[i % len(club_names)]}, timeout=3600)
+            latencies.append(time.perf_counter() - began)
+            if response.status_code != 200:
+                failures += 1
+        elapsed = time.perf_counter() - start
+    finally:
+        stop(process)
+
+    fanout_window = (
+        (telegram.last_send_at - telegram.first_send_at)
+        if telegram.first_send_at is not None else 0.0
+    )
+    return {
+        "mode": "notify",
+        "subscribers": args.subscribers,
+        "notify_requests": args.requests,
+        "notify_failures": failures,
+        "notify_latency": latency_summary(latencies),
+        "messages_sent": telegram.sent_messages,
+        "fanout_messages_per_s": telegram.sent_messages / fanout_window if fanout_window else 0.0,
+        "elapsed_s": elapsed,
+        "upstream_calls": {"ea": dict(ea.calls), "telegram": dict(telegram.calls)},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("mode", choices=["bot", "notify"])
+    parser.add_argument("--rate", type=float, default=10, help="Updates per second (bot mode)")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds of load (bot mode)")
+    parser.add_argument("--poisson", action="store_true", help="Poisson arrivals instead of a fixed rate")
+    parser.add_argument("--start-ratio", type=float, default=0.1, help="Share of /start updates (bot mode)")
+    parser.add_argument("--drain-timeout", type=float, default=60, help="Seconds to wait for late replies")
+    parser.add_argument("--subscribers", type=int, default=1000, help="Subscribed users (notify mode)")
+    parser.add_argument("--requests", type=int, default=3, help="Sequential /notify calls (notify mode)")
+    parser.add_argument("--club", help="Notify about this club every time instead of cycling through "
+                                       "the fixture clubs (notify mode)")
+    parser.add_argument("--ea-latency", type=float, default=0.2)
+    parser.add_argument("--ea-jitter", type=float, default=0.05)
+    parser.add_argument("--ea-tail-prob", type=float, default=0.0)
+    parser.add_argument("--ea-tail-latency", type=float, default=3.0)
+    parser.add_argument("--tg-latency", type=float, default=0.02)
+    parser.add_argument("--tg-jitter", type=float, default=0.01)
+    parser.add_argument("--keep-workdir", action="store_true", help="Keep logs and users.db")
+    args = parser.parse_args()
+
+    ea = FakeEAServer(latency=Latency(
+        args.ea_latency, args.ea_jitter, args.ea_tail_prob, args.ea_tail_latency
+    )).start()
+    telegram = FakeTelegramServer(latency=Latency(args.tg_latency, args.tg_jitter)).start()
+    workdir = tempfile.mkdtemp(prefix="fcbot-loadtest-")
+    try:
+        if args.mode == "bot":
+            summary = run_bot(args, ea, telegram, workdir)
+        else:
+            summary = run_notify(args, ea, telegram, workdir)
+    finally:
+        ea.stop()
+        telegram.stop()
+
+    summary["workdir"] = workdir if args.keep_workdir else None
+    if not args.keep_workdir:
+        shutil.rmtree(workdir, ignore_errors=True)
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+# logging_config.py
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from fc_clubs_api import tracing
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - [%(trace_id)s] %(message)s"
+
+# Attributes every LogRecord has; anything else was passed through `extra=`
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {
+    "message", "asctime", "trace_id",
+}
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per line. Fields passed with `extra=` are included as-is.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+            "trace_id": getattr(record, "trace_id", "-"),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Lets through at most `rate` records per second (with bursts of `burst`)
+    for each distinct message template, and reports how many were dropped
+    once the next one is let through.
+    """
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        super().__init__()
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1.0, rate)
+        self._buckets: Dict[Tuple[str, str], list] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        key = (record.name, str(record.msg))
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                # [tokens, last refill, suppressed]
+                bucket = self._buckets[key] = [self.burst, now, 0]
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            if bucket[0] < 1:
+                bucket[2] += 1
+                return False
+            bucket[0] -= 1
+            suppressed, bucket[2] = bucket[2], 0
+        if suppressed:
+            record.suppressed = suppressed
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keeps a random `rate` share of records below `max_level`.
+    """
+
+    def __init__(self, rate: float, max_level: int = logging.INFO):
+        super().__init__()
+        self.rate = rate
+        self.max_level = max_level
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno > self.max_level or random.random() < self.rate
+
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    """
+    Queue handler that never blocks the caller: the message is merged with its
+    arguments here, everything else (timestamps, JSON, I/O) happens in the
+    listener thread, and records are dropped when the queue is full.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.msg = record.getMessage()
+        record.args = None
+        suppressed = getattr(record, "suppressed", 0)
+        if suppressed:
+            record.msg = f"{record.msg} ({suppressed} similar messages suppressed)"
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def configure_logging(level: Optional[str] = None, fmt: Optional[str] = None):
+    """
+    Sets up the root logger with a non-blocking queue handler.
+
+    Configured from the environment:
+        LOG_LEVEL: root level (default INFO).
+        LOG_FORMAT: "text" or "json" (default text).
+        LOG_QUEUE_SIZE: records buffered before new ones are dropped (default 10000).
+        LOG_DEBUG_SAMPLE_RATE: share of the per-request EA debug logs kept (default 0.1).
+    """
+    global _listener
+    level = (level or os.getenv("LOG_LEVEL", "INFO")).upper()
+    fmt = (fmt or os.getenv("LOG_FORMAT", "text")).lower()
+
+    output = logging.StreamHandler()
+    output.setFormatter(JsonFormatter() if fmt == "json" else logging.Formatter(TEXT_FORMAT))
+
+    log_queue = queue.Queue(maxsize=int(os.getenv("LOG_QUEUE_SIZE", "10000")))
+    queue_handler = _DroppingQueueHandler(log_queue)
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+    # The trace ID is a contextvar, so it is read here in the calling thread
+    tracing.install_log_filter(root)
+
+    if _listener is not None:
+        _listener.stop()
+    _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+
+    # Third-party request logs are very chatty below WARNING
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    logging.getLogger("urllib3").setLevel(logging.WARNING)
+
+    # One debug record per EA request would flood the output at DEBUG
+    sample_logger(logging.getLogger("fc_clubs_api.api"),
+                  float(os.getenv("LOG_DEBUG_SAMPLE_RATE", "0.1")))
+
+
+def stop_logging():
+    """
+    Flushes queued records. Called at exit.
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def limit_logger(logger: logging.Logger, rate: float, burst: Optional[float] = None):
+    """
+    Rate-limits each message template of `logger` to `rate` records per second.
+    """
+    logger.addFilter(RateLimitFilter(rate, burst))
+
+
+def sample_logger(logger: logging.Logger, rate: float, max_level: int = logging.DEBUG):
+    """
+    Keeps a random `rate` share of `logger`'s records up to `max_level`,
+    replacing any sampling set up before.
+    """
+    for existing in [f for f in logger.filters if isinstance(f, SamplingFilter)]:
+        logger.removeFilter(existing)
+    if rate < 1:
+        logger.addFilter(SamplingFilter(rate, max_level))
@@ -2,12 +2,36 @@
 
 from fc_clubs_api.api import EAFCApiService
 from fc_clubs_api.schemas import ClubSearchInput, Platform, MatchType, MatchesStatsInput, OverallStatsInput
-from fc_clubs_api.models import Match, ClubInfo, MatchPlayersStats, OverallStats  # Updated import
+from fc_clubs_api.models import Club, Match, ClubInfo, MatchPlayersStats, OverallStats  # Updated import
+from fc_clubs_api import tracing
+import match_store
+from rolling_stats import get_rolling_stats
+from database import initialize_db
+import argparse
+import contextvars
+import json
+import requests
+import logging
+import os
+import sys
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
 from pydantic import ValidationError
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Iterator, Optional
 from datetime import datetime
 from typing import Optional
 
+logger = logging.getLogger(__name__)
+
+def warm_up():
+    """
+    Builds the pydantic schemas of the report pipeline ahead of the first report.
+    """
+    from fc_clubs_api.models import build_models
+    from fc_clubs_api.api import list_adapter
+    build_models()
+    for model in (Club, OverallStats, Match):
+        list_adapter(model)
+
 def get_overall_stats(club_id: str, platform: Platform) -> Optional[OverallStats]:
     """
     Fetches the overall stats for a given club.
@@ -85,6 +109,7 @@ def extract_match_info(match: Match, selected_club_id: str) -> Dict[str, Any]:
 
     # Match ID
     match_info['match_id'] = match.matchId
+    match_info['timestamp'] = match.timestamp
 
     # Match Timestamp (converted to human-readable format)
     match_datetime = datetime.fromtimestamp(match.timestamp)
@@ -174,11 +199,25 @@ def get_matches_info(club_name: str, platform: Platform) -> Optional[List[Dict[s
 
     # Check if any clubs were found
     if not response:
-        print("No clubs found matching the search criteria.")
+        logger.info("No clubs found matching %r.", club_name)
         return None
 
     # Step 2: Select the first club from the search results
-    selected_club = response[0]
+    return get_club_matches_info(response[0])
+
+
+def get_club_matches_info(selected_club: Club) -> Optional[List[Dict[str, Any]]]:
+    """
+    Fetches and extracts match information for a club returned by the club search.
+
+    Args:
+        selected_club (Club): The club to fetch matches for.
+
+    Returns:
+        Optional[List[Dict[str, Any]]]: A list of dictionaries containing match information,
+                                        or None if no matches are found.
+    """
+    api_service = EAFCApiService()
     selected_club_id = selected_club.clubId
 
     # Step 3: Prepare input for fetching matches
@@ -193,22 +232,26 @@ def get_matches_info(club_name: str, platform: Platform) -> Optional[List[Dict[s
 
     # Check if any matches were found
     if not matches_response:
-        print("No league matches found for the selected club.")
+        logger.info("No league matches found for club %s.", selected_club_id)
         return None
 
+    # Keep the matches in the local match history
+    match_store.record_matches(matches_response)
+
     # Step 5: Parse and extract match information
     matches_info = []
-    for match in matches_response:
-        try:
-            # Parse the match into the Match model
-            parsed_match = Match.parse_obj(match)
-        except ValidationError as e:
-            print(f"Error parsing match data: {e}")
-            continue  # Skip to the next match
-
-        # Extract match information using the separate function
-        match_info = extract_match_info(parsed_match, selected_club_id)
-        matches_info.append(match_info)
+    with tracing.span("parse_matches", matches=len(matches_response)):
+        for match in matches_response:
+            try:
+                # Parse the match into the Match model (the API service already returns models)
+                parsed_match = match if isinstance(match, Match) else Match.parse_obj(match)
+            except ValidationError as e:
+                logger.warning("Error parsing match data: %s", e)
+                continue  # Skip to the next match
+
+            # Extract match information using the separate function
+            match_info = extract_match_info(parsed_match, selected_club_id)
+            matches_info.append(match_info)
 
     return matches_info
 
@@ -218,7 +261,8 @@ def format_matches(
         matches: List[Dict[str, Any]],
         club_name: str,
         overall_stats: Optional[OverallStats] = None,
-        opposing_skill_ratings: Dict[str, Any] = {}
+        opposing_skill_ratings: Dict[str, Any] = {},
+        rolling_stats: Optional[Dict[str, Any]] = None
 ) -> str:
     """
     Formats the list of match dictionaries into a structured text with indicators and separators,
@@ -229,6 +273,8 @@ def format_matches(
         club_name (str): The name of the selected club.
         overall_stats (Optional[OverallStats]): The overall statistics of the club.
         opposing_skill_ratings (Dict[str, Any]): Mapping of opposing club IDs to their skill ratings.
+        rolling_stats (Optional[Dict[str, Any]]): The club's precomputed stats from
+                                                  rolling_stats, used for the form line.
 
     Returns:
         str: The formatted string containing overall stats and all matches with indicators and separators.
@@ -248,8 +294,12 @@ def format_matches(
     # If overall_stats is provided, format and add it
     if overall_stats:
         # Create the indicators line based on last 5 matches
-        last_5_matches = matches[:5]
-        last_5_results = [match['result'] for match in reversed(last_5_matches)]
+        if rolling_stats:
+            letters = {'W': 'win', 'D': 'draw', 'L': 'loss'}
+            last_5_results = [letters[letter] for letter in rolling_stats['last_results'][-5:]]
+        else:
+            last_5_matches = matches[:5]
+            last_5_results = [match['result'] for match in reversed(last_5_matches)]
         emojis = [indicators.get(result, '') for result in last_5_results]
         indicators_line = " ".join(emojis)
 
@@ -260,6 +310,16 @@ def format_matches(
         # Append to formatted_matches
         formatted_matches.append(overall_stats_line)
         formatted_matches.append(wins_draws_losses)
+        if rolling_stats:
+            streak_letter = {'win': 'W', 'draw': 'D', 'loss': 'L'}.get(rolling_stats['streak_result'], '')
+            # Counted from the matches stored by the bot, unlike EA's lifetime W/D/L above
+            formatted_matches.append(
+                f"Stored {rolling_stats['played']}: "
+                f"{rolling_stats['wins']}/{rolling_stats['draws']}/{rolling_stats['losses']} | "
+                f"Streak: {rolling_stats['streak']}{streak_letter} | "
+                f"Goals: {rolling_stats['goals_for']}:{rolling_stats['goals_against']} | "
+                f"Clean sheets: {rolling_stats['clean_sheets']}"
+            )
         formatted_matches.append("_____________________")
 
     # Iterate through each match and format the information
@@ -355,63 +415,247 @@ def format_matches(
     return final_output
 
 
-def main():
+def get_opposing_skill_ratings(
+        matches: List[Dict[str, Any]],
+        selected_club_id: str,
+        platform: Platform,
+        known: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
     """
-    Main function to execute the script.
+    Fetches the skill rating of every club the selected club played against.
+
+    Args:
+        matches (List[Dict[str, Any]]): The list of match information dictionaries.
+        selected_club_id (str): The ID of the selected club.
+        platform (Platform): The platform enum value.
+        known (Optional[Dict[str, Any]]): Ratings already at hand (e.g. from a cached
+                                          report); only the other opponents are fetched.
+
+    Returns:
+        Dict[str, Any]: Mapping of opposing club IDs to their skill ratings ("N/A" if unknown).
     """
-    club_name = "Metallist"  # You can parameterize this as needed
-    platform = Platform.COMMON_GEN5  # Adjust based on your platform enums
+    opposing_club_ids = {
+        team['club_id']
+        for match in matches
+        for team in match['teams']
+        if team['club_id'] != selected_club_id
+    }
+    ratings = {
+        club_id: rating for club_id, rating in (known or {}).items()
+        if club_id in opposing_club_ids and rating != "N/A"
+    }
+    opposing_club_ids -= set(ratings)
+
+    if not opposing_club_ids:
+        return ratings
+    # The lookups run side by side so they share the EA connection (multiplexed
+    # over HTTP/2); each worker keeps the caller's trace, priority and deadline
+    workers = min(len(opposing_club_ids), int(os.getenv("EA_REPORT_FANOUT", "8")))
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = {
+            club_id: executor.submit(
+                contextvars.copy_context().run, get_opposing_skill_rating, club_id, platform
+            )
+            for club_id in opposing_club_ids
+        }
+        ratings.update((club_id, future.result()) for club_id, future in futures.items())
+    return ratings
 
-    # Create an instance of the API service
-    api_service = EAFCApiService()
 
-    # Step 1: Fetch match information
-    matches_info = get_matches_info(club_name, platform)
+def get_opposing_skill_rating(club_id: str, platform: Platform) -> Any:
+    """
+    Fetches the skill rating of one opposing club, "N/A" if it is unknown.
+    """
+    try:
+        club_stats = get_overall_stats(club_id, platform)
+    except requests.RequestException as e:
+        # Opponent ratings are optional, show N/A rather than fail the report
+        logger.debug("No skill rating for club %s: %s", club_id, e)
+        return "N/A"
+    if not club_stats:
+        return "N/A"
+    try:
+        return int(club_stats.skillRating)
+    except ValueError:
+        return "N/A"
 
-    if matches_info is None:
-        print("No matches to process.")
-        return
 
-    # Step 2: Format the matches with indicators and separators
-    formatted_text = format_matches(matches_info, club_name)
+def fetch_club_report(club_name: str, platform: Platform) -> Dict[str, Any]:
+    """
+    Fetches everything needed for a club report: the club, its matches, overall
+    stats and the skill ratings of its opponents.
 
-    # Step 3: Save the formatted text to output.txt
-    with open('output.txt', 'w', encoding='utf-8') as file:
-        file.write(formatted_text)
+    Args:
+        club_name (str): The name of the club to search for.
+        platform (Platform): The platform enum value.
 
-    print("Match information has been saved to output.txt")
+    Returns:
+        Dict[str, Any]: A JSON-serializable record. 'error' is set and the data
+                        fields are missing if the club or its matches were not found.
+    """
+    record: Dict[str, Any] = {"club_name": club_name, "platform": platform.value}
 
-    # Step 4: Fetch and display overall stats of the club
-    try:
-        # Search for the club to get its ID
-        input_data = ClubSearchInput(clubName=club_name, platform=platform)
-        search_response = api_service.search_club(input_data)
-
-        if not search_response:
-            print("No clubs found matching the search criteria.")
-            return
-
-        selected_club = search_response[0]  # Select the first club
-        selected_club_id = selected_club.clubId  # Get the club ID
-
-        # Fetch overall stats using the club's ID
-        overall_stats_input = MatchesStatsInput(
-            clubIds=selected_club_id,
-            platform=platform,
-            matchType=MatchType.LEAGUE_MATCH  # Use a valid match type if necessary
+    api_service = EAFCApiService()
+    with tracing.span("club_search", club_name=club_name):
+        search_response = api_service.search_club(
+            ClubSearchInput(clubName=club_name, platform=platform)
+        )
+    if not search_response:
+        record["error"] = "club not found"
+        return record
+
+    selected_club = search_response[0]
+    record["club_id"] = selected_club.clubId
+    record["matched_name"] = selected_club.clubName
+
+    with tracing.span("matches", club_id=selected_club.clubId):
+        matches_info = get_club_matches_info(selected_club)
+    if not matches_info:
+        record["error"] = "no matches found"
+        return record
+
+    with tracing.span("overall_stats", club_id=selected_club.clubId):
+        overall_stats = get_overall_stats(selected_club.clubId, platform)
+    record["overall_stats"] = overall_stats.dict() if overall_stats else None
+    record["matches"] = matches_info
+    with tracing.span("opponents"):
+        record["opposing_skill_ratings"] = get_opposing_skill_ratings(
+            matches_info, selected_club.clubId, platform
         )
-        overall_stats_response = api_service.overall_stats(overall_stats_input)
-
-        print("\nOverall Club Stats:")
-        for stat in overall_stats_response:
-            print(f"Skill Rating: {stat.skillRating}")
-            print(f"Wins: {stat.wins}")
-            print(f"Draws (Ties): {stat.ties}")
-            print(f"Losses: {stat.losses}")
-            print("-" * 40)
-
-    except Exception as e:
-        print(f"An error occurred while fetching overall stats: {e}")
+    record["rolling_stats"] = get_rolling_stats(selected_club.clubId)
+    return record
+
+
+def render_club_report(record: Dict[str, Any]) -> str:
+    """
+    Renders a record from fetch_club_report with format_matches.
+    """
+    if record.get("error"):
+        return f"{record['club_name']}: {record['error']}"
+    overall_stats = OverallStats(**record["overall_stats"]) if record.get("overall_stats") else None
+
+    # Cached records are rendered later than they were fetched
+    matches = [
+        {**match, 'relative_time': get_relative_time(datetime.fromtimestamp(match['timestamp']))}
+        if 'timestamp' in match else match
+        for match in record["matches"]
+    ]
+    report = format_matches(
+        matches,
+        record["club_name"],
+        overall_stats,
+        record["opposing_skill_ratings"],
+        record.get("rolling_stats")
+    )
+    if record.get("stale"):
+        fetched = get_relative_time(datetime.fromtimestamp(record["fetched_at"]))
+        report = f"⚠️ EA is not responding, this report is from {fetched}.\n\n{report}"
+    return report
+
+
+def read_club_names(args: argparse.Namespace) -> Iterator[str]:
+    """
+    Yields club names from the command line, then --file, then stdin ('-').
+    Lines of a file or stdin are either plain names or JSON objects with a
+    'club_name' (or 'club') field.
+    """
+    def parse_lines(lines) -> Iterator[str]:
+        for line in lines:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if line.startswith("{"):
+                entry = json.loads(line)
+                name = entry.get("club_name") or entry.get("club")
+                if name:
+                    yield name
+            else:
+                yield line
+
+    for name in args.clubs:
+        if name != "-":
+            yield name
+    if args.file:
+        with open(args.file, encoding="utf-8") as file:
+            yield from parse_lines(file)
+    if "-" in args.clubs:
+        yield from parse_lines(sys.stdin)
+
+
+def _safe_filename(name: str) -> str:
+    return "".join(c if c.isalnum() or c in "-_." else "_" for c in name) or "club"
+
+
+def main():
+    """
+    Fetches reports for many clubs concurrently and streams one result per club.
+
+    Examples:
+        python main.py Metallist "SV Eiche eSport"
+        python main.py --file clubs.txt --workers 16 --out-dir snapshots/
+        cat clubs.jsonl | python main.py - --format report
+    """
+    parser = argparse.ArgumentParser(description="Fetch Pro Clubs reports for many clubs.")
+    parser.add_argument("clubs", nargs="*", help="Club names, or '-' to read them from stdin")
+    parser.add_argument("--file", help="File with one club name (or JSON object) per line")
+    parser.add_argument("--platform", default=Platform.COMMON_GEN5.value,
+                        choices=[p.value for p in Platform])
+    parser.add_argument("--workers", type=int, default=8, help="Clubs fetched concurrently")
+    parser.add_argument("--format", choices=["json", "report"], default="json",
+                        help="One JSON record per club, or the rendered text report")
+    parser.add_argument("--out-dir", help="Write one file per club here instead of stdout")
+    args = parser.parse_args()
+
+    if not args.clubs and not args.file:
+        parser.error("no clubs given (pass names, --file or '-' for stdin)")
+
+    initialize_db()  # Fetched matches are kept in the match history
+    platform = Platform(args.platform)
+    if args.out_dir:
+        os.makedirs(args.out_dir, exist_ok=True)
+
+    def run(club_name: str) -> Dict[str, Any]:
+        try:
+            return fetch_club_report(club_name, platform)
+        except Exception as e:
+            return {"club_name": club_name, "platform": platform.value, "error": str(e)}
+
+    def write(future) -> bool:
+        """Writes the record of a finished club, returning whether it failed."""
+        record = future.result()
+        if args.format == "json":
+            output = json.dumps(record, ensure_ascii=False)
+        else:
+            output = render_club_report(record)
+
+        if args.out_dir:
+            extension = "json" if args.format == "json" else "txt"
+            path = os.path.join(args.out_dir, f"{_safe_filename(record['club_name'])}.{extension}")
+            with open(path, "w", encoding="utf-8") as file:
+                file.write(output + "\n")
+            print(path, flush=True)
+        else:
+            print(output, flush=True)
+        return bool(record.get("error"))
+
+    workers = max(1, args.workers)
+    total = failed = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        # At most workers * 2 clubs are pending, so names are read as results
+        # are written and a long input never piles up in memory.
+        # Results are written as each club finishes, not in input order.
+        pending = set()
+        for name in read_club_names(args):
+            if len(pending) >= workers * 2:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                failed += sum(write(future) for future in done)
+            pending.add(executor.submit(run, name))
+            total += 1
+        failed += sum(write(future) for future in as_completed(pending))
+
+    if failed:
+        print(f"{failed} of {total} clubs failed.", file=sys.stderr)
+        sys.exit(1)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,209 @@
+# match_store.py
+
+import json
+import logging
+import sqlite3
+import threading
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+import database
+from rolling_stats import update_rolling_stats
+
+logger = logging.getLogger(__name__)
+
+# Called with the newly stored matches (raw dicts, oldest first)
+MatchListener = Callable[[List[Dict[str, Any]]], None]
+
+_listeners: List[MatchListener] = []
+_listeners_lock = threading.Lock()
+
+
+def add_listener(listener: MatchListener):
+    """
+    Registers a callback that receives every batch of newly stored matches.
+    Used by the indexes and aggregates that are maintained incrementally.
+    """
+    with _listeners_lock:
+        _listeners.append(listener)
+
+
+def _to_dict(match: Any) -> Dict[str, Any]:
+    # Parsed Match models are stored in the same shape as the EA payload
+    return match if isinstance(match, dict) else json.loads(match.json())
+
+
+def _match_id(match: Any) -> str:
+    return str(match["matchId"] if isinstance(match, dict) else match.matchId)
+
+
+def _known_ids(conn: sqlite3.Connection, match_ids: Iterable[str]) -> set:
+    match_ids = list(match_ids)
+    placeholders = ",".join("?" * len(match_ids))
+    return {
+        row[0] for row in conn.execute(
+            f'SELECT match_id FROM matches WHERE match_id IN ({placeholders})', match_ids
+        )
+    }
+
+
+def save_matches(matches: Iterable[Any]) -> List[Dict[str, Any]]:
+    """
+    Stores matches (Match models or raw `clubs/matches` dicts) in the match
+    history. A match is stored once and linked to every club that played it.
+
+    Returns:
+        List[Dict[str, Any]]: The matches that were not stored yet, oldest first.
+    """
+    candidates = {_match_id(match): match for match in matches}
+    if not candidates:
+        return []
+
+    conn = sqlite3.connect(database.DATABASE)
+    try:
+        # Most saves repeat matches that are stored already; find out without the write lock
+        known = _known_ids(conn, candidates)
+        unknown = {
+            match_id: _to_dict(match) for match_id, match in candidates.items() if match_id not in known
+        }
+        if not unknown:
+            return []
+
+        with conn:
+            # Take the write lock, then check again so concurrent saves agree on which matches are new
+            conn.execute('BEGIN IMMEDIATE')
+            known = _known_ids(conn, unknown)
+            new_matches = sorted(
+                (m for match_id, m in unknown.items() if match_id not in known),
+                key=lambda m: int(m["timestamp"]),
+            )
+            conn.executemany(
+                'INSERT OR IGNORE INTO matches (match_id, timestamp, payload) VALUES (?, ?, ?)',
+                [
+                    (str(m["matchId"]), int(m["timestamp"]), json.dumps(m, separators=(",", ":")))
+                    for m in new_matches
+                ],
+            )
+            conn.executemany(
+                '''
+                INSERT OR IGNORE INTO club_matches (club_id, match_id, timestamp, season_id)
+                VALUES (?, ?, ?, ?)
+                ''',
+                [
+                    (str(club_id), str(m["matchId"]), int(m["timestamp"]), club.get("season_id"))
+                    for m in new_matches
+                    for club_id, club in m["clubs"].items()
+                ],
+            )
+            update_rolling_stats(conn, new_matches)
+    finally:
+        conn.close()
+
+    if new_matches:
+        with _listeners_lock:
+            listeners = list(_listeners)
+        for listener in listeners:
+            try:
+                listener(new_matches)
+            except Exception as e:
+                logger.error("Match listener %r failed: %s", listener, e)
+    return new_matches
+
+
+def record_matches(matches: Iterable[Any]) -> List[Dict[str, Any]]:
+    """
+    Like save_matches, but never raises: storing history must not break a report.
+    """
+    try:
+        return save_matches(matches)
+    except (sqlite3.Error, KeyError, ValueError) as e:
+        logger.warning("Failed to store matches: %s", e)
+        return []
+
+
+def iter_club_matches(
+        club_id: str,
+        since_timestamp: Optional[int] = None,
+        batch_size: int = 500
+) -> Iterator[Dict[str, Any]]:
+    """
+    Yields the stored matches of a club, oldest first, reading `batch_size`
+    rows per query.
+    """
+    last = (since_timestamp if since_timestamp is not None else -1, "")
+    while True:
+        conn = sqlite3.connect(database.DATABASE)
+        try:
+            rows = conn.execute(
+                '''
+                SELECT cm.timestamp, cm.match_id, m.payload
+                FROM club_matches cm JOIN matches m ON m.match_id = cm.match_id
+                WHERE cm.club_id = ? AND (cm.timestamp, cm.match_id) > (?, ?)
+                ORDER BY cm.timestamp, cm.match_id
+                LIMIT ?
+                ''',
+                (str(club_id), last[0], last[1], batch_size),
+            ).fetchall()
+        finally:
+            conn.close()
+        for _, _, payload in rows:
+            yield json.loads(payload)
+        if len(rows) < batch_size:
+            return
+        last = (rows[-1][0], rows[-1][1])
+
+
+def iter_all_matches(since_timestamp: Optional[int] = None,
+                     batch_size: int = 500) -> Iterator[Dict[str, Any]]:
+    """
+    Yields every stored match once (played after `since_timestamp`, if given), oldest first.
+    """
+    last = (since_timestamp if since_timestamp is not None else -1, "")
+    while True:
+        conn = sqlite3.connect(database.DATABASE)
+        try:
+            rows = conn.execute(
+                '''
+                SELECT timestamp, match_id, payload FROM matches
+                WHERE (timestamp, match_id) > (?, ?)
+                ORDER BY timestamp, match_id
+                LIMIT ?
+                ''',
+                (last[0], last[1], batch_size),
+            ).fetchall()
+        finally:
+            conn.close()
+        for _, _, payload in rows:
+            yield json.loads(payload)
+        if len(rows) < batch_size:
+            return
+        last = (rows[-1][0], rows[-1][1])
+
+
+def pair_matches(club_a: str, club_b: str) -> List[Dict[str, Any]]:
+    """
+    Returns the stored matches between two clubs, oldest first.
+    """
+    conn = sqlite3.connect(database.DATABASE)
+    try:
+        rows = conn.execute(
+            '''
+            SELECT m.payload
+            FROM club_matches a
+            JOIN club_matches b ON b.club_id = ? AND b.match_id = a.match_id
+            JOIN matches m ON m.match_id = a.match_id
+            WHERE a.club_id = ?
+            ORDER BY a.timestamp, a.match_id
+            ''',
+            (str(club_b), str(club_a)),
+        ).fetchall()
+    finally:
+        conn.close()
+    return [json.loads(payload) for payload, in rows]
+
+
+def stored_club_ids() -> List[str]:
+    conn = sqlite3.connect(database.DATABASE)
+    try:
+        return [row[0] for row in conn.execute('SELECT DISTINCT club_id FROM club_matches')]
+    finally:
+        conn.close()
@@ -0,0 +1,268 @@
+# migrations.py
+
+import logging
+import sqlite3
+import time
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+# A backfill updates at most `batch_size` rows and returns how many it touched
+Backfill = Callable[[sqlite3.Connection, int], int]
+
+
+@dataclass(frozen=True)
+class Migration:
+    """
+    One schema version of users.db.
+
+    `statements` run inside the single startup transaction that also bumps
+    `PRAGMA user_version`. `deferred` statements (e.g. CREATE INDEX on a big
+    table) and the `backfill` run afterwards, each batch in its own short
+    transaction, so the bot is never locked out for long.
+    """
+    version: int
+    description: str
+    statements: Sequence[str] = ()
+    deferred: Sequence[str] = ()
+    backfill: Optional[Backfill] = None
+
+
+def _backfill_subscribed_at(conn: sqlite3.Connection, batch_size: int) -> int:
+    cursor = conn.execute(
+        '''
+        UPDATE users SET subscribed_at = ?
+        WHERE rowid IN (
+            SELECT rowid FROM users WHERE subscribed_at IS NULL LIMIT ?
+        )
+        ''',
+        (int(time.time()), batch_size),
+    )
+    return cursor.rowcount
+
+
+def _backfill_rolling_stats(conn: sqlite3.Connection, batch_size: int) -> int:
+    from rolling_stats import backfill_rolling_stats
+    return backfill_rolling_stats(conn, batch_size)
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(
+        version=1,
+        description="users table",
+        statements=[
+            '''
+            CREATE TABLE IF NOT EXISTS users (
+                user_id INTEGER PRIMARY KEY
+            )
+            ''',
+        ],
+    ),
+    Migration(
+        version=2,
+        description="users.subscribed_at",
+        statements=[
+            'ALTER TABLE users ADD COLUMN subscribed_at INTEGER',
+        ],
+        deferred=[
+            'CREATE INDEX IF NOT EXISTS idx_users_subscribed_at ON users (subscribed_at)',
+        ],
+        backfill=_backfill_subscribed_at,
+    ),
+    Migration(
+        version=3,
+        description="match history",
+        statements=[
+            '''
+            CREATE TABLE IF NOT EXISTS matches (
+                match_id TEXT PRIMARY KEY,
+                timestamp INTEGER NOT NULL,
+                payload TEXT NOT NULL
+            )
+            ''',
+            '''
+            CREATE TABLE IF NOT EXISTS club_matches (
+                club_id TEXT NOT NULL,
+                match_id TEXT NOT NULL,
+                timestamp INTEGER NOT NULL,
+                season_id TEXT,
+                PRIMARY KEY (club_id, match_id)
+            )
+            ''',
+        ],
+        deferred=[
+            'CREATE INDEX IF NOT EXISTS idx_club_matches_club_time ON club_matches (club_id, timestamp)',
+        ],
+    ),
+    Migration(
+        version=4,
+        description="club rolling stats",
+        statements=[
+            '''
+            CREATE TABLE IF NOT EXISTS club_rolling_stats (
+                club_id TEXT PRIMARY KEY,
+                club_name TEXT NOT NULL DEFAULT '',
+                played INTEGER NOT NULL DEFAULT 0,
+                wins INTEGER NOT NULL DEFAULT 0,
+                draws INTEGER NOT NULL DEFAULT 0,
+                losses INTEGER NOT NULL DEFAULT 0,
+                goals_for INTEGER NOT NULL DEFAULT 0,
+                goals_against INTEGER NOT NULL DEFAULT 0,
+                clean_sheets INTEGER NOT NULL DEFAULT 0,
+                dnf_wins INTEGER NOT NULL DEFAULT 0,
+                streak_result TEXT NOT NULL DEFAULT '',
+                streak INTEGER NOT NULL DEFAULT 0,
+                longest_win_streak INTEGER NOT NULL DEFAULT 0,
+                last_results TEXT NOT NULL DEFAULT '',
+                last_timestamp INTEGER NOT NULL DEFAULT -1,
+                last_match_id TEXT NOT NULL DEFAULT ''
+            )
+            ''',
+        ],
+        backfill=_backfill_rolling_stats,
+    ),
+    Migration(
+        version=5,
+        description="last delivered match per user and club",
+        statements=[
+            '''
+            CREATE TABLE IF NOT EXISTS user_club_deliveries (
+                user_id INTEGER NOT NULL,
+                club_id TEXT NOT NULL,
+                last_timestamp INTEGER NOT NULL,
+                last_match_id TEXT NOT NULL,
+                delivered_at INTEGER NOT NULL,
+                PRIMARY KEY (club_id, user_id)
+            )
+            ''',
+        ],
+    ),
+    Migration(
+        version=6,
+        description="report requests per club",
+        statements=[
+            '''
+            CREATE TABLE IF NOT EXISTS club_lookups (
+                club_key TEXT NOT NULL,
+                platform TEXT NOT NULL,
+                club_name TEXT NOT NULL,
+                lookups INTEGER NOT NULL DEFAULT 0,
+                last_requested INTEGER NOT NULL,
+                PRIMARY KEY (club_key, platform)
+            )
+            ''',
+        ],
+    ),
+]
+
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def migrate(
+        conn: sqlite3.Connection,
+        migrations: Sequence[Migration] = MIGRATIONS,
+        batch_size: int = 1000
+) -> int:
+    """
+    Brings the database up to the latest schema version.
+
+    Pending migrations are applied in version order in one transaction. Their
+    deferred statements and backfills are recorded in `schema_pending_work`
+    in that same transaction and then worked off in bounded batches, so an
+    interrupted startup resumes them on the next run.
+
+    Args:
+        conn (sqlite3.Connection): An open connection to the database.
+        migrations (Sequence[Migration]): The known migrations.
+        batch_size (int): Maximum number of rows touched per backfill transaction.
+
+    Returns:
+        int: The schema version after migrating.
+    """
+    migrations = sorted(migrations, key=lambda m: m.version)
+    by_version = {m.version: m for m in migrations}
+
+    # Manage transactions explicitly, sqlite3 does not open one for DDL
+    previous_isolation_level = conn.isolation_level
+    conn.isolation_level = None
+    try:
+        current = get_schema_version(conn)
+        pending = [m for m in migrations if m.version > current]
+
+        if pending:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                conn.execute('''
+                    CREATE TABLE IF NOT EXISTS schema_pending_work (
+                        version INTEGER PRIMARY KEY
+                    )
+                ''')
+                for migration in pending:
+                    logger.info(
+                        "Applying migration %d: %s", migration.version, migration.description
+                    )
+                    for statement in migration.statements:
+                        conn.execute(statement)
+                    if migration.deferred or migration.backfill:
+                        conn.execute(
+                            'INSERT OR IGNORE INTO schema_pending_work (version) VALUES (?)',
+                            (migration.version,),
+                        )
+                conn.execute(f'PRAGMA user_version = {pending[-1].version:d}')
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+            current = pending[-1].version
+
+        _run_pending_work(conn, by_version, batch_size)
+        return current
+    finally:
+        conn.isolation_level = previous_isolation_level
+
+
+def _run_pending_work(conn: sqlite3.Connection, by_version, batch_size: int):
+    has_table = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'schema_pending_work'"
+    ).fetchone()
+    if not has_table:
+        return
+
+    versions = [
+        row[0] for row in
+        conn.execute('SELECT version FROM schema_pending_work ORDER BY version')
+    ]
+    for version in versions:
+        migration = by_version.get(version)
+        if migration is None:
+            logger.warning("No migration found for pending work of version %d", version)
+            continue
+
+        for statement in migration.deferred:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                conn.execute(statement)
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+
+        if migration.backfill:
+            total = 0
+            while True:
+                conn.execute('BEGIN IMMEDIATE')
+                try:
+                    touched = migration.backfill(conn, batch_size)
+                    conn.execute('COMMIT')
+                except Exception:
+                    conn.execute('ROLLBACK')
+                    raise
+                total += touched
+                if touched < batch_size:
+                    break
+            logger.info("Backfilled %d rows for migration %d", total, version)
+
+        conn.execute('DELETE FROM schema_pending_work WHERE version = ?', (version,))
@@ -0,0 +1,243 @@
+# player_form.py
+
+import html
+import logging
+import threading
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+import match_store
+from fc_clubs_api.memory import ByteBudgetCache
+
+logger = logging.getLogger(__name__)
+
+# Per-match player stats kept for form analytics (MatchPlayersStats fields)
+STATS = [
+    "rating", "goals", "assists", "shots",
+    "passesmade", "passattempts", "tacklesmade", "tackleattempts",
+]
+_RATING, _GOALS, _ASSISTS, _SHOTS, _PASSES, _PASS_ATTEMPTS, _TACKLES, _TACKLE_ATTEMPTS = range(len(STATS))
+
+DEFAULT_WINDOW = 10
+# Players listed by /form, which keeps the reply within one Telegram message
+MAX_PLAYERS = 15
+
+
+def _number(value: Any) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+class ClubForm:
+    """
+    Player stats of one club as a (players, matches, stats) array, NaN where
+    a player did not play. Matches are appended oldest first and the array
+    grows by doubling, so adding new matches does not copy the history.
+    """
+
+    def __init__(self, club_id: str):
+        self.club_id = club_id
+        self.player_ids: List[str] = []
+        self.player_names: List[str] = []
+        self._player_index: Dict[str, int] = {}
+        self._match_ids = set()
+        self._values = np.full((8, 64, len(STATS)), np.nan)
+        self._timestamps = np.zeros(64, dtype=np.int64)
+        self.match_count = 0
+
+    @property
+    def last_timestamp(self) -> int:
+        return int(self._timestamps[self.match_count - 1]) if self.match_count else -1
+
+    def _grow(self, players: int, matches: int):
+        old_players, old_matches, _ = self._values.shape
+        if players <= old_players and matches <= old_matches:
+            return
+        new_players = old_players if players <= old_players else max(players, old_players * 2)
+        new_matches = old_matches if matches <= old_matches else max(matches, old_matches * 2)
+        values = np.full((new_players, new_matches, len(STATS)), np.nan)
+        values[:old_players, :old_matches] = self._values
+        self._values = values
+        if new_matches > old_matches:
+            timestamps = np.zeros(new_matches, dtype=np.int64)
+            timestamps[:old_matches] = self._timestamps
+            self._timestamps = timestamps
+
+    def add_matches(self, matches: Iterable[Dict[str, Any]]) -> bool:
+        """
+        Appends raw matches (oldest first). Matches already added are skipped.
+
+        Returns:
+            bool: False if a match is older than the newest one added, in which
+                  case the form has to be rebuilt from the match history.
+        """
+        for match in matches:
+            match_id = str(match["matchId"])
+            if match_id in self._match_ids:
+                continue
+            timestamp = int(match["timestamp"])
+            if timestamp < self.last_timestamp:
+                return False
+            players = match.get("players", {}).get(self.club_id)
+            if not players:
+                continue
+
+            column = self.match_count
+            for player_id in players:
+                if player_id not in self._player_index:
+                    self._player_index[player_id] = len(self.player_ids)
+                    self.player_ids.append(player_id)
+                    self.player_names.append(players[player_id].get("playername", player_id))
+            self._grow(len(self.player_ids), column + 1)
+
+            for player_id, player in players.items():
+                row = self._player_index[player_id]
+                self._values[row, column] = [_number(player.get(stat)) for stat in STATS]
+                self.player_names[row] = player.get("playername") or self.player_names[row]
+            self._timestamps[column] = timestamp
+            self._match_ids.add(match_id)
+            self.match_count += 1
+        return True
+
+    def summary(self, window: int = DEFAULT_WINDOW, min_appearances: int = 1,
+                limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Form over their last `window` appearances of the players who played in
+        any of the club's last `window` matches.
+
+        Returns:
+            List[Dict[str, Any]]: Up to `limit` entries, best average rating first:
+                appearances, rating (mean), trend (rating change per appearance,
+                least-squares slope), consistency (rating standard deviation),
+                goals/assists/shots per match and pass/tackle success in percent.
+        """
+        players = len(self.player_ids)
+        values = self._values[:players, :self.match_count]
+        played = ~np.isnan(values[:, :, _RATING])
+
+        # Appearances counted back from the newest one: 1 = last game played
+        recency = np.cumsum(played[:, ::-1], axis=1)[:, ::-1]
+        in_window = played & (recency <= window)
+        appearances = in_window.sum(axis=1)
+        # Former players keep their appearances, only list the current squad
+        keep = (appearances >= max(1, min_appearances)) & played[:, -window:].any(axis=1)
+
+        windowed = np.where(in_window[:, :, None], values, np.nan)
+        sums = np.nansum(windowed, axis=1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means = sums / appearances[:, None]
+            ratings = windowed[:, :, _RATING]
+            consistency = np.sqrt(np.nanmean((ratings - means[:, _RATING, None]) ** 2, axis=1))
+
+            # Slope of rating against appearance order (oldest = 0)
+            x = np.where(in_window, appearances[:, None] - recency, np.nan)
+            x_centered = x - np.nanmean(x, axis=1)[:, None]
+            y_centered = ratings - means[:, _RATING, None]
+            trend = np.nansum(x_centered * y_centered, axis=1) / np.nansum(x_centered ** 2, axis=1)
+            trend = np.where(appearances > 1, trend, 0.0)
+
+            attempts = sums[:, [_PASS_ATTEMPTS, _TACKLE_ATTEMPTS]]
+            success = 100 * sums[:, [_PASSES, _TACKLES]] / np.where(attempts > 0, attempts, np.nan)
+            pass_rate, tackle_rate = success[:, 0], success[:, 1]
+
+        order = np.argsort(-np.nan_to_num(means[:, _RATING], nan=-1.0), kind="stable")
+        order = order[keep[order]][:limit]
+        return [
+            {
+                "player_id": self.player_ids[i],
+                "player_name": self.player_names[i],
+                "appearances": int(appearances[i]),
+                "rating": float(means[i, _RATING]),
+                "trend": float(trend[i]),
+                "consistency": float(consistency[i]),
+                "goals": float(means[i, _GOALS]),
+                "assists": float(means[i, _ASSISTS]),
+                "shots": float(means[i, _SHOTS]),
+                "pass_rate": None if np.isnan(pass_rate[i]) else float(pass_rate[i]),
+                "tackle_rate": None if np.isnan(tackle_rate[i]) else float(tackle_rate[i]),
+            }
+            for i in order
+        ]
+
+
+# Form arrays of recently requested clubs (CACHE_BUDGET_CLUB_FORM, default 16MB)
+_forms: ByteBudgetCache[str, ClubForm] = ByteBudgetCache("club_form", "16MB")
+_forms_lock = threading.Lock()
+
+
+def _build(club_id: str) -> ClubForm:
+    form = ClubForm(club_id)
+    form.add_matches(match_store.iter_club_matches(club_id))
+    return form
+
+
+def get_club_form(club_id: str) -> ClubForm:
+    """
+    Returns the club's form arrays, built from the match history on first use
+    and kept up to date as new matches are stored.
+    """
+    club_id = str(club_id)
+    with _forms_lock:
+        form = _forms.get(club_id)
+        if form is None:
+            form = _build(club_id)
+            _forms.put(club_id, form)
+        return form
+
+
+def form_summary(club_id: str, window: int = DEFAULT_WINDOW,
+                 limit: Optional[int] = MAX_PLAYERS) -> List[Dict[str, Any]]:
+    """
+    ClubForm.summary of a club, computed while no matches are being appended.
+    """
+    form = get_club_form(club_id)
+    with _forms_lock:
+        return form.summary(window, limit=limit)
+
+
+def _on_new_matches(matches: List[Dict[str, Any]]):
+    with _forms_lock:
+        for club_id in {club_id for match in matches for club_id in match["clubs"]}:
+            form = _forms.get(club_id)
+            if form is None:
+                continue  # Built from the history when first requested
+            relevant = [match for match in matches if club_id in match["clubs"]]
+            if not form.add_matches(relevant):
+                logger.debug("Out-of-order match for club %s, rebuilding its form", club_id)
+                form = _build(club_id)
+            _forms.put(club_id, form)  # Accounts for the grown arrays
+
+
+match_store.add_listener(_on_new_matches)
+
+
+def _trend_arrow(trend: float) -> str:
+    if trend >= 0.05:
+        return "📈"
+    if trend <= -0.05:
+        return "📉"
+    return "➡️"
+
+
+def format_form(club_name: str, players: List[Dict[str, Any]], window: int = DEFAULT_WINDOW) -> str:
+    """
+    Renders a form summary as Telegram HTML.
+    """
+    if not players:
+        return f"⚠️ No player stats stored for <b>{html.escape(club_name)}</b> yet."
+
+    lines = [f"📊 <b>Player form: {html.escape(club_name)}</b> (last {window} games)\n"]
+    for player in players:
+        pass_rate = "-" if player["pass_rate"] is None else f"{player['pass_rate']:.0f}%"
+        tackle_rate = "-" if player["tackle_rate"] is None else f"{player['tackle_rate']:.0f}%"
+        lines.append(
+            f"{_trend_arrow(player['trend'])} <b>{html.escape(player['player_name'])}</b> "
+            f"— {player['rating']:.2f} ({player['trend']:+.2f}/game, ±{player['consistency']:.2f}), "
+            f"{player['appearances']} apps\n"
+            f"    ⚽ {player['goals']:.2f} 🅰️ {player['assists']:.2f} 🎯 {player['shots']:.1f} "
+            f"per game · passes {pass_rate} · tackles {tackle_rate}"
+        )
+    return "\n".join(lines)
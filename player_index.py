@@ -0,0 +1,252 @@
+# player_index.py
+
+import bisect
+import html
+import logging
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Tuple
+
+import match_store
+from fc_clubs_api.memory import estimate_size, parse_size, register_index
+from fc_clubs_api.metrics import CACHE_BYTES, CACHE_EVICTIONS
+
+logger = logging.getLogger(__name__)
+
+
+# Container slots (dict entry, sorted array pointer) per player or match ID, amortized
+_SLOT_BYTES = 120
+
+
+def _match_size(match_id: str, timestamp: int) -> int:
+    return sys.getsizeof(match_id) + sys.getsizeof(timestamp) + _SLOT_BYTES
+
+
+def _fold(name: str) -> str:
+    return " ".join(name.split()).casefold()
+
+
+class PlayerIndex:
+    """
+    Case-insensitive index of player names to the clubs they play for, from
+    the stored matches (MatchPlayersStats.playername) and fetched member
+    stats (MemberStatsMember.name).
+
+    Names are kept as a sorted array of (folded name, club ID), so exact and
+    prefix lookups are a bisect and a short scan. Built once from the recent
+    match history, then updated from new matches.
+
+    Only players seen in the last PLAYER_INDEX_DAYS days (default 180) are
+    kept, within the CACHE_BUDGET_PLAYER_INDEX byte budget (default 16MB):
+    over budget, the players seen longest ago are dropped. Its size is listed
+    by cache_usage() as "player_index".
+    """
+
+    def __init__(self):
+        self._keys: List[Tuple[str, str]] = []
+        # (folded name, club ID) -> [name, matches, last played timestamp, last seen, estimated bytes]
+        self._players: Dict[Tuple[str, str], List[Any]] = {}
+        # Match ID -> timestamp, for the matches within the window
+        self._match_ids: Dict[str, int] = {}
+        self.club_names: Dict[str, str] = {}
+        self.window_s = float(os.getenv("PLAYER_INDEX_DAYS", "180")) * 86400
+        self.max_bytes = parse_size(os.getenv("CACHE_BUDGET_PLAYER_INDEX", "16MB"))
+        self.evictions = 0
+        self._bytes = 0  # Estimated bytes of the players and match IDs, with their container slots
+        self._pruned_at = 0.0
+        self._bytes_gauge = CACHE_BYTES.labels("player_index")
+        self._evictions_counter = CACHE_EVICTIONS.labels("player_index")
+        self._lock = threading.Lock()
+        self._loaded = False
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def _add_player(self, name: str, club_id: str, timestamp: int, played: int, seen: float,
+                    pending: List):
+        key = (_fold(name), club_id)
+        if not key[0]:
+            return
+        entry = self._players.get(key)
+        if entry is None:
+            entry = self._players[key] = [name, played, timestamp, seen, 0]
+            entry[4] = estimate_size(key) + estimate_size(entry) + _SLOT_BYTES
+            self._bytes += entry[4]
+            pending.append(key)
+            return
+        entry[1] += played
+        entry[3] = max(entry[3], seen)
+        if timestamp >= entry[2]:
+            entry[0], entry[2] = name, timestamp  # Latest spelling wins
+
+    def _add_match(self, match: Dict[str, Any], pending: List):
+        match_id = str(match["matchId"])
+        timestamp = int(match["timestamp"])
+        if match_id in self._match_ids or timestamp < time.time() - self.window_s:
+            return
+        self._match_ids[match_id] = timestamp
+        self._bytes += _match_size(match_id, timestamp)
+        for club_id, club in match["clubs"].items():
+            name = (club.get("details") or {}).get("name")
+            if name:
+                self.club_names[club_id] = name
+        for club_id, players in (match.get("players") or {}).items():
+            for player in players.values():
+                if player.get("playername"):
+                    self._add_player(player["playername"], club_id, timestamp, 1, timestamp, pending)
+
+    def _insert(self, pending: List[Tuple[str, str]]):
+        if len(pending) > 64:
+            self._keys = sorted(self._keys + pending)
+        else:
+            for key in pending:
+                bisect.insort(self._keys, key)
+        self._prune()
+
+    def _prune(self):
+        """
+        Drops players and match IDs that left the window (checked hourly),
+        then, over the budget, the players seen longest ago and the match IDs
+        no newer than them, down to 90% of it.
+        """
+        now = time.time()
+        cutoff = None
+        if now - self._pruned_at >= 3600:
+            self._pruned_at = now
+            cutoff = now - self.window_s
+        over_budget = self._bytes > self.max_bytes
+        if over_budget:
+            excess = self._bytes - self.max_bytes * 0.9
+            for entry in sorted(self._players.values(), key=lambda entry: entry[3]):
+                if excess <= 0:
+                    break
+                cutoff = max(cutoff or 0, entry[3] + 1)
+                excess -= entry[4]
+        if cutoff is not None:
+            # Copied rather than popped from, so the containers shrink too
+            dropped = {key for key, entry in self._players.items() if entry[3] < cutoff}
+            if over_budget:
+                self.evictions += len(dropped)
+                self._evictions_counter.inc(len(dropped))
+            if dropped:
+                self._bytes -= sum(self._players[key][4] for key in dropped)
+                self._players = {key: entry for key, entry in self._players.items() if key not in dropped}
+                self._keys = [key for key in self._keys if key not in dropped]
+                club_ids = {key[1] for key in self._keys}
+                self.club_names = {c: name for c, name in self.club_names.items() if c in club_ids}
+            old = [(m, timestamp) for m, timestamp in self._match_ids.items() if timestamp < cutoff]
+            if old:
+                self._bytes -= sum(_match_size(m, timestamp) for m, timestamp in old)
+                self._match_ids = {m: timestamp for m, timestamp in self._match_ids.items()
+                                   if timestamp >= cutoff}
+        self._bytes_gauge.set(self._bytes)
+
+    def add_matches(self, matches: List[Dict[str, Any]]):
+        with self._lock:
+            if not self._loaded:
+                return  # Picked up by the initial load
+            pending = []
+            for match in matches:
+                self._add_match(match, pending)
+            self._insert(pending)
+
+    def add_members(self, club_id: str, club_name: str, members: Iterable[Any]):
+        """
+        Adds a club's roster from `members/stats` (MemberStatsMember models or dicts).
+        """
+        self.ensure_loaded()
+        club_id = str(club_id)
+        seen = time.time()
+        with self._lock:
+            if club_name:
+                self.club_names[club_id] = club_name
+            pending = []
+            for member in members:
+                name = member.get("name") if isinstance(member, dict) else member.name
+                if name:
+                    self._add_player(name, club_id, 0, 0, seen, pending)
+            self._insert(pending)
+
+    def ensure_loaded(self):
+        with self._lock:
+            if self._loaded:
+                return
+            pending = []
+            since = int(time.time() - self.window_s)
+            for match in match_store.iter_all_matches(since_timestamp=since):
+                self._add_match(match, pending)
+            self._keys = []
+            self._insert(pending)
+            self._loaded = True
+            logger.info("Player index built: %d players", len(self._keys))
+
+    def usage(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._keys),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "evictions": self.evictions,
+            }
+
+    def lookup(self, name: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """
+        Players whose name is `name` or starts with it, ignoring case: exact
+        matches first, most recently seen first, then prefix matches in
+        alphabetical order. Only the first `limit` entries are looked at.
+
+        Returns:
+            List[Dict[str, Any]]: name, club_id, club_name, matches, last_played and exact.
+        """
+        self.ensure_loaded()
+        prefix = _fold(name)
+        if not prefix:
+            return []
+        with self._lock:
+            found = []
+            index = bisect.bisect_left(self._keys, (prefix,))
+            while (len(found) < limit and index < len(self._keys)
+                   and self._keys[index][0].startswith(prefix)):
+                key = self._keys[index]
+                player_name, matches, last_played = self._players[key][:3]
+                found.append({
+                    "name": player_name,
+                    "club_id": key[1],
+                    "club_name": self.club_names.get(key[1], key[1]),
+                    "matches": matches,
+                    "last_played": last_played,
+                    "exact": key[0] == prefix,
+                })
+                index += 1
+        # Exact matches come first in the array; order them by recency, keep the rest alphabetical
+        found.sort(key=lambda p: (not p["exact"], -p["last_played"] if p["exact"] else 0))
+        return found
+
+
+INDEX = PlayerIndex()
+match_store.add_listener(INDEX.add_matches)
+register_index("player_index", INDEX.usage)
+
+
+def format_players(query: str, players: List[Dict[str, Any]]) -> str:
+    """
+    Renders player lookup results as Telegram HTML.
+    """
+    query = html.escape(query)
+    if not players:
+        return f"⚠️ No stored player matches <b>{query}</b>."
+
+    lines = [f"🔎 Players matching <b>{query}</b>:\n"]
+    for player in players:
+        if player["last_played"]:
+            date = datetime.fromtimestamp(player["last_played"]).strftime('%Y-%m-%d')
+            seen = f"{player['matches']} matches, last on {date}"
+        else:
+            seen = "club member"
+        lines.append(
+            f"👤 <b>{html.escape(player['name'])}</b> — {html.escape(player['club_name'])} ({seen})"
+        )
+    return "\n".join(lines)
@@ -0,0 +1,148 @@
+# profiling.py
+
+import contextvars
+import cProfile
+import io
+import logging
+import os
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Profiles taken by run() in worker threads for the capture of the calling context
+_worker_profiles: contextvars.ContextVar[Optional[List[cProfile.Profile]]] = \
+    contextvars.ContextVar("worker_profiles", default=None)
+
+
+class ProfileCapture:
+    """
+    Captures cProfile profiles of the next N calls wrapped in `capture()`.
+
+    Each captured call is written to `<directory>/<name>-<session>-<n>-<label>.prof`
+    together with a text summary of the top functions, and when the last of
+    the N calls finishes a combined summary of the whole session is written.
+
+    Only one call is profiled at a time (cProfile cannot run two profilers at
+    once); calls that arrive while another one is being profiled run normally.
+    In the asyncio bot the profile of an update also contains whatever other
+    updates ran while it was awaiting.
+
+    cProfile only sees the thread it was enabled in, so work a captured call
+    hands to a worker thread must go through `run()` to be included.
+    """
+
+    def __init__(self, name: str, directory: Optional[str] = None, top: int = 30):
+        self.name = name
+        self.directory = directory or os.getenv("PROFILE_DIR", "profiles")
+        self.top = top
+        self._lock = threading.Lock()
+        self._remaining = 0
+        self._active = False
+        self._session: Optional[str] = None
+        self._captured: List[str] = []
+
+    @property
+    def remaining(self) -> int:
+        return self._remaining
+
+    def arm(self, count: int):
+        """
+        Profiles the next `count` calls.
+        """
+        with self._lock:
+            self._remaining = max(0, count)
+            self._session = time.strftime("%Y%m%d-%H%M%S")
+            self._captured = []
+        logger.info("Profiling the next %d %s calls into %s", count, self.name, self.directory)
+
+    def arm_from_env(self, variable: str = "PROFILE_NEXT_N"):
+        count = int(os.getenv(variable, "0") or 0)
+        if count > 0:
+            self.arm(count)
+
+    @contextmanager
+    def capture(self, label: str = "call"):
+        with self._lock:
+            take = self._remaining > 0 and not self._active
+            if take:
+                self._active = True
+                self._remaining -= 1
+                index = len(self._captured) + 1
+                session = self._session
+                last = self._remaining == 0
+        if not take:
+            yield
+            return
+
+        profiler = cProfile.Profile()
+        workers: List[cProfile.Profile] = []
+        token = _worker_profiles.set(workers)
+        try:
+            profiler.enable()
+            try:
+                yield
+            finally:
+                profiler.disable()
+                _worker_profiles.reset(token)
+            self._write(profiler, workers, session, index, label, last)
+        finally:
+            with self._lock:
+                self._active = False
+
+    @staticmethod
+    def run(func: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Calls `func` in the current (worker) thread, profiling it into the
+        capture it was started from. The context must be copied from the
+        captured call, as asyncio.to_thread does; otherwise `func` is just called.
+        """
+        workers = _worker_profiles.get()
+        if workers is None:
+            return func(*args, **kwargs)
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Python 3.12+ profiles every thread from the capturing one
+            return func(*args, **kwargs)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profiler.disable()
+            workers.append(profiler)
+
+    def _write(self, profiler: cProfile.Profile, workers: List[cProfile.Profile],
+               session: str, index: int, label: str, last: bool):
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            base = os.path.join(self.directory, f"{self.name}-{session}-{index:03d}-{label}")
+            stats = pstats.Stats(profiler)
+            for worker in workers:
+                stats.add(worker)
+            stats.dump_stats(base + ".prof")
+            summary = self._summary(stats)
+            with open(base + ".txt", "w", encoding="utf-8") as file:
+                file.write(summary)
+            with self._lock:
+                self._captured.append(base + ".prof")
+                captured = list(self._captured)
+
+            if last:
+                combined = pstats.Stats(*captured)
+                path = os.path.join(self.directory, f"{self.name}-{session}-summary.txt")
+                with open(path, "w", encoding="utf-8") as file:
+                    file.write(self._summary(combined))
+                logger.info("Profiling session finished, summary written to %s", path)
+        except OSError as e:
+            logger.error("Failed to write profile: %s", e)
+
+    def _summary(self, stats: pstats.Stats) -> str:
+        stream = io.StringIO()
+        stats.stream = stream
+        stats.strip_dirs().sort_stats("cumulative").print_stats(self.top)
+        stats.sort_stats("tottime").print_stats(self.top)
+        return stream.getvalue()
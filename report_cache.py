@@ -0,0 +1,147 @@
+# report_cache.py
+
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+import requests
+
+from fc_clubs_api.deadline import deadline
+from fc_clubs_api.memory import ByteBudgetCache
+from fc_clubs_api.metrics import record_cache_lookup
+from fc_clubs_api.platform import Platform
+
+logger = logging.getLogger(__name__)
+
+
+class ReportCache:
+    """
+    Last good club report per club, served stale while EA is slow or failing.
+
+    A report is fetched within `deadline_s` seconds in total, split across its
+    EA requests. Reports younger than `fresh_s` are returned without asking EA.
+    Reports fetched by warm() are returned for up to `warm_s` instead, and
+    refreshed in the background once they are older than `fresh_s`, so users
+    of warmed clubs do not wait for EA. When a fetch fails and the cached report is younger than `max_stale_s`,
+    that report is returned marked as stale and a refresh runs in the
+    background with a longer deadline.
+
+    Configured from the environment:
+        REPORT_DEADLINE: seconds a user waits for a report (default 8).
+        REPORT_CACHE_TTL: seconds a report is served without refetching (default 30).
+        REPORT_WARM_TTL: seconds a warmed report is served while it is refreshed (default 600).
+        REPORT_MAX_STALE: oldest report served when EA fails (default 86400).
+        REPORT_REFRESH_DEADLINE: seconds given to a background refresh (default 60).
+        CACHE_BUDGET_REPORT: bytes of reports kept, least recently used dropped (default 16MB).
+    """
+
+    def __init__(self):
+        self.deadline_s = float(os.getenv("REPORT_DEADLINE", "8"))
+        self.fresh_s = float(os.getenv("REPORT_CACHE_TTL", "30"))
+        self.warm_s = max(self.fresh_s, float(os.getenv("REPORT_WARM_TTL", "600")))
+        self.max_stale_s = float(os.getenv("REPORT_MAX_STALE", "86400"))
+        self.refresh_deadline_s = float(os.getenv("REPORT_REFRESH_DEADLINE", "60"))
+        # (club name, platform) -> (fetched at, record, warmed)
+        self._entries: ByteBudgetCache[Tuple[str, str], Tuple[float, Dict[str, Any], bool]] = (
+            ByteBudgetCache("report", "16MB")
+        )
+        self._refreshing = set()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(club_name: str, platform: Platform) -> Tuple[str, str]:
+        return club_name.strip().lower(), platform.value
+
+    def _fetch(self, club_name: str, platform: Platform, seconds: float,
+               warm: bool = False) -> Dict[str, Any]:
+        from main import fetch_club_report
+
+        with deadline(seconds):
+            record = fetch_club_report(club_name, platform)
+        if not record.get("error"):
+            self._entries.put(self._key(club_name, platform), (time.time(), record, warm))
+        return record
+
+    def get_report(self, club_name: str, platform: Platform) -> Dict[str, Any]:
+        """
+        Returns a fetch_club_report record. Stale records have 'stale' set and
+        'fetched_at' holding the time they were fetched.
+
+        Raises:
+            requests.RequestException: EA failed and no usable report is cached.
+        """
+        entry = self._entries.get(self._key(club_name, platform))
+        age = time.time() - entry[0] if entry else None
+        fresh = entry is not None and age < (self.warm_s if entry[2] else self.fresh_s)
+        record_cache_lookup("report", fresh)
+        if fresh:
+            if age >= self.fresh_s:
+                self._refresh_in_background(club_name, platform, warm=True)
+            return entry[1]
+
+        try:
+            return self._fetch(club_name, platform, self.deadline_s)
+        except requests.RequestException as e:
+            if not entry or age >= self.max_stale_s:
+                raise
+            logger.warning("Serving a stale report for %s (%.0fs old): %s", club_name, age, e)
+            self._refresh_in_background(club_name, platform, warm=entry[2])
+            return {**entry[1], "stale": True, "fetched_at": entry[0]}
+
+    def warm(self, club_name: str, platform: Platform) -> Optional[Dict[str, Any]]:
+        """
+        Fetches and caches a report ahead of the first request for it, with
+        the background refresh deadline.
+
+        Returns:
+            Optional[Dict[str, Any]]: The cached record, None if there was no report to cache.
+        """
+        record = self._fetch(club_name, platform, self.refresh_deadline_s, warm=True)
+        return None if record.get("error") else record
+
+    def get_cached(self, club_name: str, platform: Platform) -> Optional[Dict[str, Any]]:
+        """
+        Returns the cached record if it is younger than `warm_s`, without asking EA.
+        """
+        entry = self._entries.get(self._key(club_name, platform))
+        if entry is None or time.time() - entry[0] >= self.warm_s:
+            return None
+        return entry[1]
+
+    def _refresh_in_background(self, club_name: str, platform: Platform, warm: bool = False):
+        key = self._key(club_name, platform)
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def refresh():
+            try:
+                # A new thread starts with an empty context: BACKGROUND priority, no deadline
+                self._fetch(club_name, platform, self.refresh_deadline_s, warm)
+            except requests.RequestException as e:
+                logger.warning("Background refresh of %s failed: %s", club_name, e)
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=refresh, name="report-refresh", daemon=True).start()
+
+
+_cache: Optional[ReportCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_report_cache() -> ReportCache:
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ReportCache()
+    return _cache
+
+
+def get_report(club_name: str, platform: Platform) -> Dict[str, Any]:
+    return get_report_cache().get_report(club_name, platform)
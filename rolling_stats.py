@@ -0,0 +1,154 @@
+# rolling_stats.py
+
+import json
+import sqlite3
+from typing import Any, Dict, Iterable, Optional
+
+import database
+
+# Results kept for the form line, newest last
+LAST_N = 10
+
+_COLUMNS = [
+    "club_id", "club_name", "played", "wins", "draws", "losses",
+    "goals_for", "goals_against", "clean_sheets", "dnf_wins",
+    "streak_result", "streak", "longest_win_streak", "last_results",
+    "last_timestamp", "last_match_id",
+]
+_RESULT_LETTERS = {"win": "W", "draw": "D", "loss": "L"}
+
+
+def _empty(club_id: str) -> Dict[str, Any]:
+    stats = dict.fromkeys(_COLUMNS, 0)
+    stats.update(club_id=club_id, club_name="", streak_result="", last_results="",
+                 last_timestamp=-1, last_match_id="")
+    return stats
+
+
+def _goals(club: Dict[str, Any]) -> int:
+    try:
+        return int(club.get("goals"))
+    except (TypeError, ValueError):
+        return 0
+
+
+def apply_match(stats: Dict[str, Any], match: Dict[str, Any]):
+    """
+    Adds one raw match, newer than every match already counted, to a club's stats.
+    """
+    club_id = stats["club_id"]
+    club = match["clubs"][club_id]
+    opponent = next((c for cid, c in match["clubs"].items() if cid != club_id), None)
+    goals_for = _goals(club)
+    goals_against = _goals(opponent) if opponent else _goals({"goals": club.get("goalsAgainst")})
+    result = "win" if goals_for > goals_against else "loss" if goals_for < goals_against else "draw"
+
+    stats["played"] += 1
+    stats[{"win": "wins", "draw": "draws", "loss": "losses"}[result]] += 1
+    stats["goals_for"] += goals_for
+    stats["goals_against"] += goals_against
+    stats["clean_sheets"] += goals_against == 0
+    stats["dnf_wins"] += club.get("winnerByDnf") == "1"
+
+    if stats["streak_result"] == result:
+        stats["streak"] += 1
+    else:
+        stats["streak_result"], stats["streak"] = result, 1
+    if result == "win":
+        stats["longest_win_streak"] = max(stats["longest_win_streak"], stats["streak"])
+    stats["last_results"] = (stats["last_results"] + _RESULT_LETTERS[result])[-LAST_N:]
+
+    stats["club_name"] = (club.get("details") or {}).get("name") or stats["club_name"]
+    stats["last_timestamp"] = int(match["timestamp"])
+    stats["last_match_id"] = str(match["matchId"])
+
+
+def _load(conn: sqlite3.Connection, club_id: str) -> Optional[Dict[str, Any]]:
+    row = conn.execute(
+        f'SELECT {", ".join(_COLUMNS)} FROM club_rolling_stats WHERE club_id = ?', (club_id,)
+    ).fetchone()
+    return dict(zip(_COLUMNS, row)) if row else None
+
+
+def _save(conn: sqlite3.Connection, stats: Dict[str, Any]):
+    conn.execute(
+        f'INSERT OR REPLACE INTO club_rolling_stats ({", ".join(_COLUMNS)}) '
+        f'VALUES ({", ".join("?" * len(_COLUMNS))})',
+        [stats[column] for column in _COLUMNS],
+    )
+
+
+def rebuild_rolling_stats(conn: sqlite3.Connection, club_id: str) -> Dict[str, Any]:
+    """
+    Recomputes a club's stats from its whole match history.
+    """
+    stats = _empty(club_id)
+    rows = conn.execute(
+        '''
+        SELECT m.payload FROM club_matches cm JOIN matches m ON m.match_id = cm.match_id
+        WHERE cm.club_id = ? ORDER BY cm.timestamp, cm.match_id
+        ''',
+        (club_id,),
+    )
+    for (payload,) in rows:
+        apply_match(stats, json.loads(payload))
+    _save(conn, stats)
+    return stats
+
+
+def update_rolling_stats(conn: sqlite3.Connection, matches: Iterable[Dict[str, Any]]):
+    """
+    Counts newly stored matches (oldest first) for both of their clubs, in the
+    caller's transaction. A match older than a club's newest counted match
+    changes its streaks, so that club is rebuilt from the history instead.
+    """
+    loaded: Dict[str, Dict[str, Any]] = {}
+    rebuild = set()
+    for match in matches:
+        for club_id in match["clubs"]:
+            if club_id in rebuild:
+                continue
+            stats = loaded.get(club_id)
+            if stats is None:
+                stats = loaded[club_id] = _load(conn, club_id) or _empty(club_id)
+            if int(match["timestamp"]) < stats["last_timestamp"]:
+                rebuild.add(club_id)
+                continue
+            apply_match(stats, match)
+
+    for club_id, stats in loaded.items():
+        if club_id not in rebuild:
+            _save(conn, stats)
+    for club_id in rebuild:
+        rebuild_rolling_stats(conn, club_id)
+
+
+def backfill_rolling_stats(conn: sqlite3.Connection, batch_size: int) -> int:
+    """
+    Migration backfill: builds the stats of up to `batch_size` clubs that
+    have stored matches but no stats yet.
+    """
+    club_ids = [
+        row[0] for row in conn.execute(
+            '''
+            SELECT DISTINCT club_id FROM club_matches
+            WHERE club_id NOT IN (SELECT club_id FROM club_rolling_stats)
+            LIMIT ?
+            ''',
+            (batch_size,),
+        )
+    ]
+    for club_id in club_ids:
+        rebuild_rolling_stats(conn, club_id)
+    return len(club_ids)
+
+
+def get_rolling_stats(club_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Returns the stored stats of a club, or None if none of its matches are stored.
+    """
+    conn = sqlite3.connect(database.DATABASE)
+    try:
+        return _load(conn, str(club_id))
+    finally:
+        conn.close()
@@ -1,23 +1,36 @@
 import os
 import logging
+import threading
+import time
 import requests
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from dotenv import load_dotenv
-from database import get_all_users
-from main import get_matches_info, get_overall_stats, format_matches
-from fc_clubs_api.schemas import Platform, ClubSearchInput
-from fc_clubs_api.api import EAFCApiService
-from telegram.error import TelegramError
+from database import (
+    initialize_db,
+    iter_user_id_chunks,
+    get_delivery_floor,
+    get_last_deliveries,
+    record_deliveries,
+)
+from fc_clubs_api.platform import Platform
+from fc_clubs_api.metrics import REGISTRY, CONTENT_TYPE, Counter, Gauge, Histogram
+from fc_clubs_api import tracing
+from profiling import ProfileCapture
+from logging_config import configure_logging, limit_logger, sample_logger
 
 # Load environment variables
 load_dotenv()
 
-# Configure logging
-logging.basicConfig(
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    level=logging.INFO,
-)
+# Configure logging (LOG_LEVEL, LOG_FORMAT)
+configure_logging()
 logger = logging.getLogger(__name__)
+# A Telegram outage would otherwise log one error per subscriber
+limit_logger(logger, rate=float(os.getenv("NOTIFY_LOG_RATE", "5")))
+# Deliveries are logged per subscriber at DEBUG
+sample_logger(logger, rate=float(os.getenv("LOG_DEBUG_SAMPLE_RATE", "0.1")))
+
+# Create the tables here so WSGI servers that import the app get them too
+initialize_db()
 
 # Initialize Flask app
 app = Flask(__name__)
@@ -27,14 +40,81 @@ if not TELEGRAM_BOT_TOKEN:
     logger.error("TELEGRAM_BOT_TOKEN is not set in environment variables.")
     exit(1)
 
-TELEGRAM_API_URL = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage"
+TELEGRAM_API_BASE_URL = os.getenv("TELEGRAM_API_BASE_URL", "https://api.telegram.org/bot")
+TELEGRAM_API_URL = f"{TELEGRAM_API_BASE_URL}{TELEGRAM_BOT_TOKEN}/sendMessage"
+
+NOTIFICATIONS = Counter(
+    "notify_messages_total",
+    "Broadcast messages by outcome (sent, failed, or skipped when nothing was new).",
+    ["outcome"],
+)
+NOTIFICATIONS_SENT = NOTIFICATIONS.labels("sent")
+NOTIFICATIONS_FAILED = NOTIFICATIONS.labels("failed")
+NOTIFICATIONS_SKIPPED = NOTIFICATIONS.labels("skipped")
+BROADCAST_SECONDS = Histogram(
+    "notify_broadcast_duration_seconds",
+    "Time to deliver one /notify broadcast to all subscribers.",
+    buckets=(0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0),
+)
+BROADCAST_THROUGHPUT = Gauge(
+    "notify_broadcast_messages_per_second",
+    "Delivery throughput of the last /notify broadcast.",
+)
+
+PROFILER = ProfileCapture("notify")
+PROFILER.arm_from_env()  # PROFILE_NEXT_N profiles the first /notify calls after start
+
+# Token required in the X-Admin-Token header of admin endpoints
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+@app.route('/admin/profile', methods=['POST'])
+def admin_profile():
+    """
+    Profiles the next N /notify calls.
+    Expects an optional JSON payload with the 'count' field (default 10).
+    """
+    if not ADMIN_TOKEN or request.headers.get("X-Admin-Token") != ADMIN_TOKEN:
+        return jsonify({"error": "Forbidden."}), 403
+
+    data = request.get_json(silent=True) or {}
+    try:
+        count = int(data.get("count", 10))
+    except (TypeError, ValueError):
+        return jsonify({"error": "'count' must be an integer."}), 400
+
+    PROFILER.arm(count)
+    return jsonify({
+        "message": f"Profiling the next {count} /notify calls.",
+        "directory": PROFILER.directory,
+    }), 200
+
+@app.route('/admin/caches', methods=['GET'])
+def admin_caches():
+    """
+    Entries, estimated bytes and budgets of the in-process caches.
+    """
+    if not ADMIN_TOKEN or request.headers.get("X-Admin-Token") != ADMIN_TOKEN:
+        return jsonify({"error": "Forbidden."}), 403
+
+    from fc_clubs_api.memory import cache_usage
+    return jsonify(cache_usage()), 200
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    return Response(REGISTRY.render(), mimetype=CONTENT_TYPE)
 
 @app.route('/notify', methods=['POST'])
+@tracing.traced("server.notify")
 def notify():
     """
     Endpoint to notify all users about a team's latest matches.
-    Expects a JSON payload with the 'team_name' field.
+    Expects a JSON payload with the 'team_name' field. Each user only gets the
+    matches newer than the last one delivered to them, unless 'full' is true.
     """
+    with PROFILER.capture("notify"):
+        return _notify()
+
+def _notify():
     data = request.get_json()
     if not data or 'team_name' not in data:
         return jsonify({"error": "Missing 'team_name' in request payload."}), 400
@@ -43,11 +123,26 @@ def notify():
     if not team_name:
         return jsonify({"error": "'team_name' cannot be empty."}), 400
 
+    # Users only get matches newer than the last one delivered to them, unless 'full' is set
+    full_report = bool(data.get('full', False))
+
+    # The report pipeline is imported on first use to keep startup fast
+    from main import get_matches_info, get_overall_stats, get_opposing_skill_ratings, format_matches
+    from rolling_stats import get_rolling_stats
+    from report_cache import get_report_cache
+    from fc_clubs_api.api import EAFCApiService
+    from fc_clubs_api.schemas import ClubSearchInput
+
     platform = Platform.COMMON_GEN5  # Adjust as needed or make it dynamic
 
+    # Set for a club report: the matches are sent per user, everything else goes to all users
+    selected_club_id = None
+    message = None
+
     try:
         # Fetch match information
-        matches_info = get_matches_info(team_name, platform)
+        with tracing.span("matches", club_name=team_name):
+            matches_info = get_matches_info(team_name, platform)
 
         if not matches_info:
             message = f"⚠️ No matches found for the club <b>{team_name}</b>."
@@ -56,8 +151,9 @@ def notify():
             api_service = EAFCApiService()
 
             # Search for the club to get its ID
-            input_data = ClubSearchInput(clubName=team_name, platform=platform)
-            search_response = api_service.search_club(input_data)
+            with tracing.span("club_search"):
+                input_data = ClubSearchInput(clubName=team_name, platform=platform)
+                search_response = api_service.search_club(input_data)
 
             if not search_response:
                 message = f"⚠️ No clubs found matching the name <b>{team_name}</b>."
@@ -65,8 +161,22 @@ def notify():
                 selected_club = search_response[0]
                 selected_club_id = selected_club.clubId
 
+                # Only matches some subscriber has not received yet are rendered
+                delivery_floor = -1 if full_report else get_delivery_floor(selected_club_id)
+                if delivery_floor is None:
+                    return jsonify({"message": "No subscribed users to notify."}), 200
+                matches_info = [m for m in matches_info if m['timestamp'] > delivery_floor]
+                if not matches_info:
+                    return jsonify({
+                        "message": "No new matches since the last notification.",
+                        "total_users": 0,
+                        "sent": 0,
+                        "failed": 0,
+                    }), 200
+
                 # Fetch overall stats using the club's ID
-                overall_stats = get_overall_stats(selected_club_id, platform)
+                with tracing.span("overall_stats", club_id=selected_club_id):
+                    overall_stats = get_overall_stats(selected_club_id, platform)
 
                 if not overall_stats:
                     overall_stats_message = "⚠️ No overall stats found for the specified club."
@@ -74,43 +184,43 @@ def notify():
                     # Proceed without overall_stats
                     overall_stats = None
 
-                # **New Steps to Include Opposing Teams' Skill Ratings**
-
-                # 1. Collect all unique opposing club IDs
-                opposing_club_ids = set()
-                for match in matches_info:
-                    for team in match['teams']:
-                        if team['club_id'] != selected_club_id:
-                            opposing_club_ids.add(team['club_id'])
-
-                # 2. Fetch skill ratings for opposing clubs
-                opposing_skill_ratings = {}
-                for club_id in opposing_club_ids:
-                    club_stats = get_overall_stats(club_id, platform)
-                    if club_stats:
-                        try:
-                            skill_rating = int(club_stats.skillRating)
-                        except ValueError:
-                            skill_rating = "N/A"
-                        opposing_skill_ratings[club_id] = skill_rating
-                    else:
-                        opposing_skill_ratings[club_id] = "N/A"
-
-                # 3. Format the matches with indicators and separators, including overall stats and opposing skill ratings
-                message = format_matches(
-                    matches_info,
-                    team_name,
-                    overall_stats,
-                    opposing_skill_ratings  # Pass the skill ratings mapping
-                )
+                # Skill ratings of the opposing clubs: those of a warmed report are reused,
+                # the rest are fetched side by side ("N/A" if a lookup fails)
+                cached_report = get_report_cache().get_cached(team_name, platform)
+                with tracing.span("opponents"):
+                    opposing_skill_ratings = get_opposing_skill_ratings(
+                        matches_info, selected_club_id, platform,
+                        known=cached_report.get("opposing_skill_ratings") if cached_report else None,
+                    )
+
+                rolling_stats = get_rolling_stats(selected_club_id)
+                newest_match = max(matches_info, key=lambda m: m['timestamp'])
 
     except Exception as e:
-        logger.error(f"Error fetching match information: {e}")
+        logger.error("Error fetching match information: %s", e)
         return jsonify({"error": "Failed to fetch match information."}), 500
 
-    users = get_all_users()
-    if not users:
-        return jsonify({"message": "No subscribed users to notify."}), 200
+    # One rendered message per distinct last-delivered timestamp
+    rendered = {}
+
+    def message_for(last_timestamp):
+        if selected_club_id is None:
+            return message
+        if last_timestamp not in rendered:
+            new_matches = [m for m in matches_info if m['timestamp'] > last_timestamp]
+            if not new_matches:
+                rendered[last_timestamp] = None
+            else:
+                # Format the matches with indicators and separators, including overall stats and opposing skill ratings
+                with tracing.span("render", matches=len(new_matches)):
+                    rendered[last_timestamp] = format_matches(
+                        new_matches,
+                        team_name,
+                        overall_stats,
+                        opposing_skill_ratings,  # Pass the skill ratings mapping
+                        rolling_stats
+                    )
+        return rendered[last_timestamp]
 
     def send_message(user_id, text):
         payload = {
@@ -122,26 +232,69 @@ def notify():
         try:
             response = requests.post(TELEGRAM_API_URL, json=payload, timeout=10)
             response.raise_for_status()
-            logger.info(f"Notification sent to {user_id}")
+            logger.debug("Notification sent to %s", user_id)
             return True
         except requests.exceptions.RequestException as e:
-            logger.error(f"Failed to send notification to {user_id}: {e}")
+            logger.error("Failed to send notification to %s: %s", user_id, e)
             return False
 
+    # Stream subscribers from the database so sending starts right away
     sent_count = 0
     failed_count = 0
-    for user_id in users:
-        if send_message(user_id, message):
-            sent_count += 1
-        else:
-            failed_count += 1
+    skipped_count = 0
+    broadcast_start = time.perf_counter()
+    with tracing.span("broadcast") as broadcast_span:
+        for chunk in iter_user_id_chunks():
+            last_deliveries = {}
+            if selected_club_id is not None and not full_report:
+                last_deliveries = get_last_deliveries(selected_club_id, chunk)
+            delivered = []
+            for user_id in chunk:
+                text = message_for(last_deliveries.get(user_id, -1))
+                if text is None:
+                    skipped_count += 1
+                    NOTIFICATIONS_SKIPPED.inc()
+                    continue
+                if send_message(user_id, text):
+                    sent_count += 1
+                    NOTIFICATIONS_SENT.inc()
+                    delivered.append(user_id)
+                else:
+                    failed_count += 1
+                    NOTIFICATIONS_FAILED.inc()
+            if selected_club_id is not None:
+                record_deliveries(
+                    selected_club_id, delivered, newest_match['timestamp'], newest_match['match_id']
+                )
+        broadcast_span.set_attribute("sent", sent_count)
+        broadcast_span.set_attribute("failed", failed_count)
+        broadcast_span.set_attribute("skipped", skipped_count)
+
+    total_users = sent_count + failed_count
+    broadcast_seconds = time.perf_counter() - broadcast_start
+    BROADCAST_SECONDS.observe(broadcast_seconds)
+    if total_users and broadcast_seconds > 0:
+        BROADCAST_THROUGHPUT.set(total_users / broadcast_seconds)
+    if not total_users and not skipped_count:
+        return jsonify({"message": "No subscribed users to notify."}), 200
 
     return jsonify({
         "message": f"Notifications sent to {sent_count} users. {failed_count} failed.",
-        "total_users": len(users),
+        "total_users": total_users,
         "sent": sent_count,
-        "failed": failed_count
+        "failed": failed_count,
+        "skipped": skipped_count
     }), 200
 
+def preload_report_modules():
+    from main import warm_up
+    warm_up()
+
+    # Keeps the reports of subscribed and popular clubs cached; /notify reuses their opponent ratings
+    from cache_warming import keep_warm
+    keep_warm(members=False)
+
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5001)
+    # Load the report pipeline in the background while the server starts
+    threading.Thread(target=preload_report_modules, name="preload", daemon=True).start()
+    app.run(host='0.0.0.0', port=int(os.getenv("PORT", "5001")))